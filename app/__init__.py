@@ -10,12 +10,15 @@ import sys
 import argparse
 
 from flask import Flask
+from PIL import Image
 from brother_ql.models import ALL_MODELS
 
 from . import fonts
+from .json_provider import OrjsonProvider
 from config import Config, config_by_env
 
 FONTS = None
+_PILLOW_CONFIGURED = False
 
 
 def create_app(config_class=None) -> Flask:
@@ -24,11 +27,14 @@ def create_app(config_class=None) -> Flask:
         env = os.getenv('FLASK_ENV', 'production')
         config_class = config_by_env.get(env, Config)
     app = Flask(__name__, instance_relative_config=True)
+    app.json = OrjsonProvider(app)
     app.config.from_object(config_class)
     app.config.from_pyfile('application.py', silent=True)
 
     app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
 
+    configure_pillow(app)
+
     FONTS = init_fonts(app)
 
     # Only parse command-line arguments if not running under pytest
@@ -57,6 +63,21 @@ def create_app(config_class=None) -> Flask:
     return app
 
 
+def configure_pillow(app: Flask):
+    """
+    Apply IMAGE_BLOCK_CACHE to Pillow's block allocator. The setting is
+    process-wide and shared with every other Pillow user, so only the first
+    app created in a process applies it, and an explicit PILLOW_BLOCKS_MAX
+    environment variable always wins.
+    """
+    global _PILLOW_CONFIGURED
+    if _PILLOW_CONFIGURED:
+        return
+    _PILLOW_CONFIGURED = True
+    if 'PILLOW_BLOCKS_MAX' not in os.environ:
+        Image.core.set_blocks_max(app.config.get('IMAGE_BLOCK_CACHE', 0))
+
+
 def init_fonts(app: Flask):
     FONTS = fonts.Fonts(app.logger,
                         app.config.get('LABEL_DEFAULT_FONT_FAMILY'),
@@ -15,6 +15,8 @@ class Fonts:
         self.default_family = default_family
         self.default_style = default_style
         self.additional_path = additional_path
+        # get_path() results; the font table does not change after the scan
+        self._path_cache = {}
 
         # Scan for TTF/OTF fonts using pure Python (fontTools).
         # :param additional_path: Directory to search in addition to
@@ -107,9 +109,13 @@ class Fonts:
         return bool(self.fonts)
 
     def get_path(self, font: str):
+        path = self._path_cache.get(font)
+        if path is not None:
+            return path
         family_name, style_name = font.split(",", 1)
         if family_name not in self.fonts:
             raise LookupError(f"Unknown font family: {family_name}")
         if style_name not in self.fonts[family_name]:
             raise LookupError(f"Unknown font style: {style_name} for font {family_name}")
-        return self.fonts[family_name][style_name]
+        path = self._path_cache[font] = self.fonts[family_name][style_name]
+        return path
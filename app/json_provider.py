@@ -0,0 +1,80 @@
+"""
+Flask JSON provider backed by orjson.
+
+Every ``jsonify`` response, ``request.get_json`` call and ``tojson``
+template filter goes through ``app.json``; orjson serializes and parses
+considerably faster than the standard library.
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# Flask serializes dates as HTTP dates and falls back to ``default`` for
+# them, so datetimes must not be handled by orjson itself
+_BASE_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_COMPACT_SEPARATORS = (',', ':')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that uses orjson and falls back to the standard library
+    for arguments orjson does not support (e.g. custom separators), for
+    values it rejects (e.g. integers wider than 64 bits) and for non-ASCII
+    output while ``ensure_ascii`` is set, which orjson cannot escape.
+    """
+
+    def _options(self, kwargs: dict):
+        """Return orjson options for ``json.dumps`` style ``kwargs``, or None."""
+        option = _BASE_OPTIONS
+        for key, value in kwargs.items():
+            if key == 'sort_keys':
+                continue
+            if key == 'default' and value is self.default:
+                continue
+            if key == 'ensure_ascii':
+                continue
+            if key == 'indent' and value in (None, 2):
+                if value == 2:
+                    option |= orjson.OPT_INDENT_2
+                continue
+            if key == 'separators' and value == _COMPACT_SEPARATORS and not kwargs.get('indent'):
+                continue
+            return None
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _dumps_bytes(self, obj, kwargs: dict):
+        option = self._options(kwargs)
+        if option is None:
+            return None
+        try:
+            data = orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return None
+        if kwargs.get('ensure_ascii', self.ensure_ascii) and not data.isascii():
+            return None
+        return data
+
+    def dumps(self, obj, **kwargs) -> str:
+        data = self._dumps_bytes(obj, kwargs)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # the standard library also accepts NaN and Infinity
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._dumps_bytes(obj, {'indent': 2} if pretty else {})
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
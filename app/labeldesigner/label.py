@@ -9,6 +9,6 @@ All label classes and utilities have been split into focused modules:
 """
 
 from .enums import LabelContent, LabelOrientation, LabelType  # noqa: F401
-from .label_utils import FONT_CACHE, _draw_dashed_line  # noqa: F401
+from .label_utils import load_font, _draw_dashed_line  # noqa: F401
 from .simple_label import SimpleLabel  # noqa: F401
 from .shipping_label import ShippingLabel  # noqa: F401
@@ -1,10 +1,8 @@
 """Shared utilities and constants for label rendering."""
 
-from PIL import ImageFont
-from typing import Dict, Tuple
+import functools
 
-# Shared font cache to avoid reloading fonts on every render
-FONT_CACHE: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+from PIL import Image, ImageDraw, ImageFont
 
 # Text length above which a warning is logged
 WARNING_TEXT_LENGTH = 500
@@ -13,6 +11,27 @@ DEFAULT_RANDOM_LENGTH = 64
 # Default font size fallback
 DEFAULT_FONT_SIZE = 12
 
+# Text measurement never touches pixels or draw state, so one tiny image
+# serves every label renderer
+MEASURE_DRAW = ImageDraw.Draw(Image.new('L', (1, 1), 'white'))
+
+
+@functools.lru_cache(maxsize=256)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """
+    Load a TrueType font, shared by all labels to avoid reloading fonts on
+    every render. Bounded, as the font size is chosen freely per line.
+    """
+    return ImageFont.truetype(path, size)
+
+
+def has_dynamic_lines(lines) -> bool:
+    """
+    True if any text line renders differently each time: it uses templates
+    such as {{counter}} or {{random}}, or is drawn with shifted text.
+    """
+    return any('{{' in str(line.get('text', '')) or 'shift' in line for line in lines)
+
 
 def _draw_dashed_line(draw, x0, y0, x1, y1, fill=(190, 190, 190), width=1, dash_len=8, gap_len=5):
     """Draw a dashed line from (x0, y0) to (x1, y1)."""
@@ -33,3 +52,34 @@ def _draw_dashed_line(draw, x0, y0, x1, y1, fill=(190, 190, 190), width=1, dash_
             )
         pos = end_pos
         drawing = not drawing
+
+
+@functools.lru_cache(maxsize=64)
+def _dashed_line_mask(dx, dy, width, dash_len, gap_len):
+    """
+    Render a dashed line from (0, 0) to (dx, dy) into an 'L' mask, offset by
+    ``width`` on both axes so wide strokes are not clipped. Returns the mask
+    and the top-left corner of the line's start relative to the mask.
+    """
+    left, top = min(dx, 0) - width, min(dy, 0) - width
+    mask = Image.new('L', (abs(dx) + 2 * width + 1, abs(dy) + 2 * width + 1), 0)
+    _draw_dashed_line(ImageDraw.Draw(mask), -left, -top, dx - left, dy - top,
+                      fill=255, width=width, dash_len=dash_len, gap_len=gap_len)
+    return mask, left, top
+
+
+def _paste_dashed_line(img, x0, y0, x1, y1, fill=(190, 190, 190), width=1, dash_len=8, gap_len=5):
+    """
+    Same as _draw_dashed_line for integer coordinates, but stamps a cached
+    mask with a single paste instead of drawing every dash separately.
+    Only horizontal and vertical lines use the mask: wide diagonal strokes
+    rasterize differently depending on their absolute position, so those
+    are drawn directly.
+    """
+    if x0 != x1 and y0 != y1:
+        _draw_dashed_line(ImageDraw.Draw(img), x0, y0, x1, y1, fill=fill, width=width,
+                          dash_len=dash_len, gap_len=gap_len)
+        return
+    mask, left, top = _dashed_line_mask(x1 - x0, y1 - y0, width, dash_len, gap_len)
+    x, y = x0 + left, y0 + top
+    img.paste(fill, (x, y, x + mask.width, y + mask.height), mask)
@@ -1,7 +1,11 @@
 import logging
 import os
 import stat
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from brother_ql.backends.helpers import send
 from brother_ql import BrotherQLRaster, create_label
 from brother_ql.backends.helpers import get_status
@@ -12,6 +16,22 @@ from brother_ql.models import ALL_MODELS
 
 logger = logging.getLogger(__name__)
 
+# Draws the next queued label while the current one is converted to raster
+# data. A single worker keeps labels, and the global random state behind
+# {{random}}/{{uuid}}/shift, in queue order.
+RENDER_WORKERS = 1
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool() -> ThreadPoolExecutor:
+    """Create the render pool on first use, so importers do not start threads."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='label-render')
+        return _render_pool
+
 
 class PrinterQueue:
     def __init__(self, model, device_specifier, label_size):
@@ -32,7 +52,15 @@ class PrinterQueue:
             logger.warning("Print queue is empty.")
             return "Print queue is empty."
         qlr = BrotherQLRaster(self.model)
-        for entry in self._print_queue:
+        entries = self._print_queue
+        labels = [entry['label'] for entry in entries]
+        # Consecutive copies queued with the same label object share its image
+        upcoming = iter([label for i, label in enumerate(labels) if i == 0 or label is not labels[i - 1]])
+        render_pool = _get_render_pool()
+        renders = deque(render_pool.submit(label.generate, rotate=False)
+                        for label in islice(upcoming, RENDER_WORKERS))
+        previous = None
+        for entry in entries:
             label = entry['label']
             cut = entry['cut']
             high_res = entry['high_res']
@@ -40,7 +68,12 @@ class PrinterQueue:
                 rotate = 0 if label.label_orientation == LabelOrientation.STANDARD else 90
             else:
                 rotate = 'auto'
-            img = label.generate(rotate=False)
+            if label is not previous:
+                img = renders.popleft().result()
+                previous = label
+                following = next(upcoming, None)
+                if following is not None:
+                    renders.append(render_pool.submit(following.generate, rotate=False))
             dither = label.label_content != LabelContent.IMAGE_BW
             create_label(
                 qlr,
@@ -206,9 +239,11 @@ def get_ptr_status(config: Config):
                 scan_log = []
                 for i in range(0, 11):
                     dev = f"/dev/usb/lp{i}"
-                    if not os.path.exists(dev):
+                    try:
+                        st = os.stat(dev)
+                    except FileNotFoundError:
                         continue
-                    if not stat.S_ISCHR(os.stat(dev).st_mode):
+                    if not stat.S_ISCHR(st.st_mode):
                         logger.debug('Skipping %s: not a character device', dev)
                         continue
                     spec = f"file://{dev}"
@@ -299,9 +334,11 @@ def get_ptr_status(config: Config):
         else:
             if device_specifier.startswith('file://'):
                 dev_path = device_specifier[7:]
-                if not os.path.exists(dev_path):
-                    raise FileNotFoundError(f"Printer device not found: {dev_path}")
-                if not stat.S_ISCHR(os.stat(dev_path).st_mode):
+                try:
+                    st = os.stat(dev_path)
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"Printer device not found: {dev_path}") from None
+                if not stat.S_ISCHR(st.st_mode):
                     raise OSError(f"Path is not a character device: {dev_path}")
                 configure_printer_power(dev_path)
             printer = get_printer(device_specifier)
@@ -1,27 +1,99 @@
 """HTTP route handlers for the label designer blueprint."""
 
-import base64
+import glob
+import hashlib
 import logging
 import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from types import MappingProxyType
 
 import barcode
-from flask import current_app, json, jsonify, make_response, render_template, request
-from werkzeug.utils import secure_filename
+import orjson
+import pybase64
+from flask import Response, current_app, jsonify, make_response, render_template, request, send_file, stream_with_context
 from brother_ql.labels import ALL_LABELS, FormFactor
 
 from . import bp
 from app import FONTS
 from app.utils import fill_first_line_fields, image_to_png_bytes
+from .label_utils import has_dynamic_lines
 from .printer import PrinterQueue, get_ptr_status, reset_printer_cache
 from .services import (
+    build_label_template,
     create_label_from_request,
     create_printer_from_request,
     get_repo_dir,
     load_repo_json,
+    load_repo_label,
+    safe_filename,
 )
 
 LINE_SPACINGS = (100, 150, 200, 250, 300)
 HIGH_RES_DPI = 600
+PREVIEW_COMPRESS_LEVEL = 1
+PREVIEW_CACHE_SIZE = 64
+REPO_IMAGE_CACHE_SIZE = 32
+# Base64 characters decoded per write when saving images (a multiple of 4)
+IMAGE_B64_CHUNK_SIZE = 64 * 1024
+# Repository files keep the sorted, two-space indented layout of flask.json
+REPO_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+# Request values that only change how a preview is delivered, not its pixels
+_PREVIEW_TRANSPORT_KEYS = frozenset(('return_format', 'log_level', 'compress_level'))
+
+# (identifier, name, is_round, tape_size) for the label size selector
+_LABEL_SIZES = tuple(
+    (label.identifier, label.name, label.form_factor == FormFactor.ROUND_DIE_CUT, label.tape_size)
+    for label in ALL_LABELS
+)
+
+# Human readable label names by brother_ql identifier
+_LABEL_NAME_BY_ID = {label.identifier: label.name for label in ALL_LABELS}
+
+# Top-level label size of a repository file, matched without parsing the JSON
+_LABEL_SIZE_PATTERNS = (
+    re.compile(rb'"label_size"\s*:\s*"([^"\\]+)"'),
+    re.compile(rb'"labelSize"\s*:\s*"([^"\\]+)"'),
+)
+_LABEL_SIZE_PEEK_BYTES = 4096
+
+# File extensions of images stored alongside repository labels
+_MIME_TO_EXT = MappingProxyType({
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/gif': '.gif',
+    'application/pdf': '.pdf'
+})
+# Not a plain inversion: both JPEG spellings map to one canonical type
+_EXT_TO_MIME = MappingProxyType({
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.pdf': 'application/pdf'
+})
+
+# Failures caused by the submitted label (bad sizes, unknown fonts, invalid
+# barcode data); logged without a traceback
+_CLIENT_ERRORS = (ValueError, LookupError, barcode.errors.BarcodeError)
+
+# LRU of rendered preview PNGs, keyed by a digest of the request payload
+_preview_cache = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
+# Repository listings by directory: the directory mtime_ns they were built
+# for, the listed entries and {path: ((mtime_ns, size), entry)} per file
+_repo_list_cache = {}
+_repo_list_cache_lock = threading.Lock()
+
+# LRU of base64-encoded repository images, keyed by (path, mtime_ns, size)
+_repo_image_b64_cache = OrderedDict()
+_repo_image_b64_cache_lock = threading.Lock()
 
 
 # ---------------------------------------------------------------------------
@@ -39,22 +111,19 @@ def handle_value_error(e):
 
 @bp.route('/')
 def index():
-    label_sizes = [
-        (label.identifier, label.name, label.form_factor == FormFactor.ROUND_DIE_CUT, label.tape_size)
-        for label in ALL_LABELS
-    ]
+    default_font_family, default_font_style = FONTS.get_default_font()
     return render_template(
         'labeldesigner.html',
         fonts=FONTS.fontlist(),
-        label_sizes=label_sizes,
+        label_sizes=_LABEL_SIZES,
         default_label_size=current_app.config['LABEL_DEFAULT_SIZE'],
         default_font_size=current_app.config['LABEL_DEFAULT_FONT_SIZE'],
         default_orientation=current_app.config['LABEL_DEFAULT_ORIENTATION'],
         default_qr_size=current_app.config['LABEL_DEFAULT_QR_SIZE'],
         default_image_mode=current_app.config['IMAGE_DEFAULT_MODE'],
         default_bw_threshold=current_app.config['IMAGE_DEFAULT_BW_THRESHOLD'],
-        default_font_family=FONTS.get_default_font()[0],
-        default_font_style=FONTS.get_default_font()[1],
+        default_font_family=default_font_family,
+        default_font_style=default_font_style,
         line_spacings=LINE_SPACINGS,
         default_line_spacing=current_app.config['LABEL_DEFAULT_LINE_SPACING'],
         default_dpi=HIGH_RES_DPI,
@@ -69,17 +138,103 @@ def index():
 # Preview / print
 # ---------------------------------------------------------------------------
 
-def _image_response(im, return_format: str):
-    """Return a Flask response with PNG bytes or base64-encoded text."""
-    data = image_to_png_bytes(im)
-    if return_format == 'base64':
-        data = base64.b64encode(data)
-        content_type = 'text/plain'
+def _compress_level() -> int:
+    """Return the PNG deflate level requested by the client (0-9)."""
+    level = int(request.values.get('compress_level', PREVIEW_COMPRESS_LEVEL))
+    return min(max(level, 0), 9)
+
+
+def _preview_cache_key(values: dict, files: dict, compress_level: int):
+    """
+    Return a digest identifying the preview rendered from ``values`` and
+    ``files``, or None if the label is not reproducible (templates such as
+    {{datetime}} or {{random}}, and shifted text, change on every render).
+    """
+    if any('{{' in value for value in values.values() if isinstance(value, str)):
+        return None
+    lines = values.get('text') or []
+    if isinstance(lines, (str, bytes)):
+        try:
+            lines = orjson.loads(lines)
+        except orjson.JSONDecodeError:
+            return None  # rendering reports the error
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines) \
+            or has_dynamic_lines(lines):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    payload = {k: v for k, v in values.items() if k not in _PREVIEW_TRANSPORT_KEYS}
+    digest.update(orjson.dumps(payload, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS))
+    digest.update(bytes([compress_level]))
+    # Default fonts, margins and image decoding come from the app config.
+    # Read on every request: the cache is shared by all apps in the process
+    # and their config may change after create_app()
+    settings = sorted((k, v) for k, v in current_app.config.items() if k.startswith(('LABEL_', 'FONT_', 'IMAGE_')))
+    digest.update(repr(settings).encode('utf-8'))
+    for name in sorted(files):
+        stream = files[name].stream
+        position = stream.tell()
+        digest.update(name.encode('utf-8'))
+        for chunk in iter(lambda: stream.read(65536), b''):
+            digest.update(chunk)
+        stream.seek(position)
+    image_ref = values.get('image')
+    if isinstance(image_ref, str) and len(image_ref) > 0:
+        # Repository images are referenced by name; key on the file state
+        image_path = os.path.join(get_repo_dir(), safe_filename(image_ref))
+        try:
+            st = os.stat(image_path)
+            digest.update(f'{image_path}:{st.st_mtime_ns}:{st.st_size}'.encode('utf-8'))
+        except OSError:
+            digest.update(image_path.encode('utf-8'))
+    return digest.digest()
+
+
+def _render_preview_png(values: dict, files: dict, compress_level: int):
+    """
+    Render a label preview as PNG, reusing the result of identical requests.
+    Returns the PNG bytes and an ETag, which is None for previews that are
+    not reproducible.
+    """
+    key = _preview_cache_key(values, files, compress_level)
+    etag = key.hex() if key is not None else None
+    if key is not None:
+        with _preview_cache_lock:
+            png = _preview_cache.get(key)
+            if png is not None:
+                _preview_cache.move_to_end(key)
+                return png, etag
+    label = create_label_from_request(values, files)
+    png = image_to_png_bytes(label.generate(rotate=True, preview=True), compress_level)
+    if key is not None:
+        with _preview_cache_lock:
+            _preview_cache[key] = png
+            _preview_cache.move_to_end(key)
+            while len(_preview_cache) > PREVIEW_CACHE_SIZE:
+                _preview_cache.popitem(last=False)
+    return png, etag
+
+
+def _log_request_error(e: Exception):
+    """Log an exception that is reported back to the client."""
+    if isinstance(e, _CLIENT_ERRORS):
+        current_app.logger.warning('Request rejected: %s', e)
     else:
-        content_type = 'image/png'
-    resp = make_response(data)
-    resp.headers.set('Content-type', content_type)
-    return resp
+        current_app.logger.exception(e)
+
+
+def _png_response(data: bytes, return_format: str, etag: str = None):
+    """
+    Return a Flask response with PNG bytes or base64-encoded text. With an
+    ``etag``, a matching If-None-Match is answered with 304 Not Modified.
+    """
+    if return_format == 'base64':
+        response = Response(pybase64.b64encode(data), content_type='text/plain')
+        if etag:
+            response.set_etag(f'{etag}-b64')
+        return response.make_conditional(request)
+    # A file response lets WSGI servers pass the buffer to wsgi.file_wrapper
+    return send_file(BytesIO(data), mimetype='image/png', max_age=0,
+                     etag=etag or False, conditional=True)
 
 
 @bp.route('/api/preview', methods=['POST'])
@@ -92,47 +247,47 @@ def preview_from_image():
     try:
         values = request.values.to_dict(flat=True)
         files = request.files.to_dict(flat=True)
-        label = create_label_from_request(values, files)
-        im = label.generate(rotate=True)
+        png, etag = _render_preview_png(values, files, _compress_level())
     except Exception as e:
-        current_app.logger.exception(e)
+        _log_request_error(e)
         error = 413 if "too long" in str(e) else 400
         return make_response(jsonify({'message': str(e)}), error)
-    return _image_response(im, request.values.get('return_format', 'png'))
+    return _png_response(png, request.values.get('return_format', 'png'), etag)
 
 
 @bp.route('/api/print', methods=['POST', 'GET'])
 def print_label():
     return_dict = {'success': False}
+    values = request.values.to_dict(flat=True)
+    files = request.files.to_dict(flat=True)
     try:
-        log_level = request.values.get('log_level')
+        log_level = values.get('log_level')
         if log_level:
             level = getattr(logging, log_level.upper(), None)
             if isinstance(level, int):
                 current_app.logger.setLevel(level)
-        printer = create_printer_from_request(request.values.to_dict(flat=True))
-        print_count = int(request.values.get('print_count', 1))
+        printer = create_printer_from_request(values)
+        print_count = int(values.get('print_count', 1))
         if print_count < 1:
             raise ValueError("print_count must be greater than 0")
-        cut_once = int(request.values.get('cut_once', 0)) == 1
-        high_res = int(request.values.get('high_res', 0)) != 0
+        cut_once = int(values.get('cut_once', 0)) == 1
+        high_res = int(values.get('high_res', 0)) != 0
     except Exception as e:
         return_dict['message'] = str(e)
-        current_app.logger.exception(e)
+        _log_request_error(e)
         return make_response(jsonify(return_dict), 400)
 
     status = ""
     try:
+        template = build_label_template(values, files)
         for i in range(print_count):
-            values = request.values.to_dict(flat=True)
-            files = request.files.to_dict(flat=True)
-            label = create_label_from_request(values, files, i)
+            label = template.instantiate(i)
             cut = not cut_once or (cut_once and i == print_count - 1)
             printer.add_label_to_queue(label, cut, high_res)
         status = printer.process_queue()
     except Exception as e:
         return_dict['message'] = str(e)
-        current_app.logger.exception(e)
+        _log_request_error(e)
         return make_response(jsonify(return_dict), 400)
 
     return_dict['success'] = len(status) == 0
@@ -146,14 +301,22 @@ def print_label():
 # Printer status
 # ---------------------------------------------------------------------------
 
-@bp.route('/api/barcodes', methods=['GET'])
-def get_barcodes():
+def _barcode_types() -> tuple:
+    """Return the supported barcode types, with CODE128 and QR listed first."""
     barcodes = [code.upper() for code in barcode.PROVIDED_BARCODES]
     for pin in ('QR', 'CODE128'):
         if pin in barcodes:
             barcodes.remove(pin)
         barcodes.insert(0, pin)
-    return {'barcodes': barcodes}
+    return tuple(barcodes)
+
+
+_BARCODE_TYPES = _barcode_types()
+
+
+@bp.route('/api/barcodes', methods=['GET'])
+def get_barcodes():
+    return {'barcodes': _BARCODE_TYPES}
 
 
 @bp.route('/api/printer_status', methods=['GET'])
@@ -171,30 +334,140 @@ def rescan_printers():
 # Label repository
 # ---------------------------------------------------------------------------
 
+def _read_label_size(path: str):
+    """Return the label size stored in a repository file, or None."""
+    with open(path, 'rb', buffering=0) as fh:
+        head = fh.read(_LABEL_SIZE_PEEK_BYTES)
+        for pattern in _LABEL_SIZE_PATTERNS:
+            match = pattern.search(head)
+            if match:
+                return match.group(1).decode('utf-8')
+        # Not in the first few KiB (or not a plain string): parse the whole
+        # file, reusing what was already read
+        raw = head if len(head) < _LABEL_SIZE_PEEK_BYTES else head + fh.read()
+    data = orjson.loads(raw)
+    return data.get('label_size') or data.get('labelSize')
+
+
+def _repo_image_b64(image_path: str, st: os.stat_result) -> str:
+    """Return the base64 text of a repository image, reusing unchanged files."""
+    key = (image_path, st.st_mtime_ns, st.st_size)
+    with _repo_image_b64_cache_lock:
+        encoded = _repo_image_b64_cache.get(key)
+        if encoded is not None:
+            _repo_image_b64_cache.move_to_end(key)
+            return encoded
+    with open(image_path, 'rb', buffering=0) as imgfh:
+        encoded = pybase64.b64encode_as_string(imgfh.read())
+    with _repo_image_b64_cache_lock:
+        _repo_image_b64_cache[key] = encoded
+        while len(_repo_image_b64_cache) > REPO_IMAGE_CACHE_SIZE:
+            _repo_image_b64_cache.popitem(last=False)
+    return encoded
+
+
+def _iter_image_b64(text: str):
+    """Yield the decoded bytes of base64 image data in bounded chunks."""
+    if any(ws in text for ws in ('\n', '\r', ' ', '\t')):
+        # Hand-made payloads may be wrapped; strict decoding rejects whitespace
+        text = ''.join(text.split())
+    # Decoding whole quanta per slice keeps only one chunk alive at a time;
+    # validate=True takes libbase64's fast path
+    for start in range(0, len(text), IMAGE_B64_CHUNK_SIZE):
+        yield pybase64.b64decode(text[start:start + IMAGE_B64_CHUNK_SIZE], validate=True)
+
+
+def _write_atomic(path: str, data):
+    """
+    Write ``data`` (bytes or an iterable of byte chunks) to ``path`` through
+    a temporary file and rename it into place.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = (data,)
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in data:
+                fh.write(chunk)
+        # mkstemp creates 0600 files; keep the permissions open() would give
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _scan_repo(repo: str, dir_mtime: int, known: dict):
+    """
+    Yield the listing entries of ``repo``, re-reading only files whose
+    mtime or size changed since they were last seen in ``known``. The
+    finished listing is stored in the cache for ``dir_mtime``.
+    """
+    with os.scandir(repo) as it:
+        dir_entries = sorted((e for e in it if e.name.lower().endswith('.json')), key=lambda e: e.name)
+    entries = []
+    files = {}
+    for dir_entry in dir_entries:
+        try:
+            stat = dir_entry.stat()
+        except FileNotFoundError:
+            continue  # deleted since the directory was scanned
+        version = (stat.st_mtime_ns, stat.st_size)
+        seen = known.get(dir_entry.path)
+        if seen is not None and seen[0] == version:
+            entry = seen[1]
+        else:
+            entry = {'name': dir_entry.name, 'mtime': int(stat.st_mtime), 'size': stat.st_size}
+            try:
+                label_size = _read_label_size(dir_entry.path)
+            except Exception:
+                # Headers may already be sent; list the file so it can still be deleted
+                current_app.logger.exception(f'Failed to read repository file {dir_entry.name}')
+                label_size = None
+            if label_size:
+                entry['label_size'] = str(_LABEL_NAME_BY_ID.get(label_size, label_size))
+            else:
+                entry['label_size'] = None
+        files[dir_entry.path] = (version, entry)
+        entries.append(entry)
+        yield entry
+    with _repo_list_cache_lock:
+        _repo_list_cache[repo] = {'dir_mtime': dir_mtime, 'entries': entries, 'files': files}
+
+
+def _invalidate_repo_list(repo: str):
+    """Force the next listing of ``repo`` to rescan (per-file entries are kept)."""
+    with _repo_list_cache_lock:
+        cached = _repo_list_cache.get(repo)
+        if cached is not None:
+            cached['dir_mtime'] = None
+
+
 @bp.route('/api/repository/list', methods=['GET'])
 def repo_list():
     repo = get_repo_dir()
-    files = []
-    for name in sorted(os.listdir(repo)):
-        if not name.lower().endswith('.json'):
-            continue
-        path = os.path.join(repo, name)
-        stat = os.stat(path)
-        entry = {'name': name, 'mtime': int(stat.st_mtime), 'size': stat.st_size}
-        with open(path, 'r', encoding='utf-8') as fh:
-            data = json.load(fh)
-        label_size = data.get('label_size') or data.get('labelSize')
-        if label_size:
-            label_size_human = next(
-                (label.name for label in ALL_LABELS if label.identifier == label_size), None
-            )
-            if label_size_human:
-                label_size = f"{label_size_human}"
-            entry['label_size'] = str(label_size)
-        else:
-            entry['label_size'] = None
-        files.append(entry)
-    return {'files': files}
+    dir_mtime = os.stat(repo).st_mtime_ns
+    with _repo_list_cache_lock:
+        cached = _repo_list_cache.get(repo)
+    if cached is not None and cached['dir_mtime'] == dir_mtime:
+        entries = cached['entries']
+    else:
+        entries = _scan_repo(repo, dir_mtime, cached['files'] if cached is not None else {})
+
+    def generate():
+        # Emit {"files": [...]} one entry at a time instead of building the list
+        yield b'{"files":['
+        separator = b''
+        for entry in entries:
+            yield separator + orjson.dumps(entry)
+            separator = b','
+        yield b']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 
 @bp.route('/api/repository/save', methods=['POST'])
@@ -205,7 +478,7 @@ def repo_save():
     name = data.get('name') or request.values.get('name') or None
     if not name:
         return make_response(jsonify({'success': False, 'message': 'No name provided'}), 400)
-    filename = secure_filename(name)
+    filename = safe_filename(name)
     if not filename.lower().endswith('.json'):
         filename = filename + '.json'
     repo = get_repo_dir()
@@ -213,25 +486,17 @@ def repo_save():
     try:
         text = data.get('fontSettingsPerLine', [])
         if isinstance(text, str):
-            data['text'] = json.loads(text)
+            data['text'] = orjson.loads(text)
 
         try:
             img_b64 = data.get('image_data')
             if isinstance(img_b64, str) and len(img_b64) > 0:
                 img_mime = data.get('image_mime', 'image/png')
-                ext = {
-                    'image/png': '.png',
-                    'image/jpeg': '.jpg',
-                    'image/jpg': '.jpg',
-                    'image/gif': '.gif',
-                    'application/pdf': '.pdf'
-                }.get(img_mime, '.png')
+                ext = _MIME_TO_EXT.get(img_mime, '.png')
                 base_name = os.path.splitext(filename)[0]
-                image_name = secure_filename(data.get('image_name') or (base_name + '_image' + ext))
+                image_name = safe_filename(data.get('image_name') or (base_name + '_image' + ext))
                 image_path = os.path.join(repo, image_name)
-                import base64 as _b64
-                with open(image_path, 'wb') as imgfh:
-                    imgfh.write(_b64.b64decode(img_b64))
+                _write_atomic(image_path, _iter_image_b64(img_b64))
                 data['image'] = image_name
         except Exception:
             current_app.logger.exception('Failed to store base64 image from JSON')
@@ -244,8 +509,8 @@ def repo_save():
             if key in data:
                 del data[key]
 
-        with open(path, 'w', encoding='utf-8') as fh:
-            json.dump(data, fh, ensure_ascii=False, indent=2, default=str)
+        _write_atomic(path, orjson.dumps(data, option=REPO_JSON_OPTIONS, default=str))
+        _invalidate_repo_list(repo)
     except Exception as e:
         current_app.logger.exception(e)
         return make_response(jsonify({'success': False, 'message': 'Failed to save file'}), 500)
@@ -257,37 +522,43 @@ def repo_load():
     name = request.values.get('name')
     if not name:
         return make_response(jsonify({'success': False, 'message': 'No name specified'}), 400)
-    filename = secure_filename(name)
     repo = get_repo_dir()
-    path = os.path.join(repo, filename)
-    if not os.path.exists(path):
-        return make_response(jsonify({'success': False, 'message': 'Not found'}), 404)
     try:
-        with open(path, 'r', encoding='utf-8') as fh:
-            data = json.load(fh)
-        text = data.get('text', [])
-        data['text'] = json.dumps(text)
+        try:
+            data, text_json = load_repo_label(name)
+        except FileNotFoundError:
+            return make_response(jsonify({'success': False, 'message': 'Not found'}), 404)
+        if request.values.get('format') == 'raw':
+            # Only the stored image, sent as-is so clients can cache it
+            image_ref = data.get('image')
+            if isinstance(image_ref, str) and len(image_ref) > 0:
+                image_path = os.path.join(repo, safe_filename(image_ref))
+                mime = _EXT_TO_MIME.get(os.path.splitext(image_path)[1].lower(), 'application/octet-stream')
+                try:
+                    # send_file resolves relative paths against the app root,
+                    # the repository against the working directory
+                    return send_file(os.path.abspath(image_path), mimetype=mime, conditional=True)
+                except (FileNotFoundError, IsADirectoryError):
+                    pass
+            return make_response(jsonify({'success': False, 'message': 'No image stored'}), 404)
+        text = data['text']
+        data['text'] = text_json
         data = fill_first_line_fields(text, data)
         try:
             image_ref = data.get('image')
             if isinstance(image_ref, str) and len(image_ref) > 0:
-                image_path = os.path.join(repo, secure_filename(image_ref))
-                if os.path.exists(image_path):
-                    import base64 as _b64
-                    with open(image_path, 'rb') as imgfh:
-                        b = imgfh.read()
+                image_path = os.path.join(repo, safe_filename(image_ref))
+                try:
+                    st = os.stat(image_path)
+                except FileNotFoundError:
+                    st = None
+                if st is not None:
                     _, ext = os.path.splitext(image_path)
                     ext = ext.lower()
-                    mime = {
-                        '.png': 'image/png',
-                        '.jpg': 'image/jpeg',
-                        '.jpeg': 'image/jpeg',
-                        '.gif': 'image/gif',
-                        '.pdf': 'application/pdf'
-                    }.get(ext, 'application/octet-stream')
+                    mime = _EXT_TO_MIME.get(ext, 'application/octet-stream')
                     data['image_name'] = image_ref
                     data['image_mime'] = mime
-                    data['image_data'] = _b64.b64encode(b).decode('ascii')
+                    data['image_data'] = _repo_image_b64(image_path, st)
         except Exception:
             current_app.logger.exception('Failed to include repository image in load response')
         return data
@@ -302,21 +573,23 @@ def repo_delete():
     name = jdata.get('name') or request.values.get('name')
     if not name:
         return make_response(jsonify({'success': False, 'message': 'No name specified'}), 400)
-    filename = secure_filename(name)
+    filename = safe_filename(name)
     repo = get_repo_dir()
     path = os.path.join(repo, filename)
-    if not os.path.exists(path):
-        return make_response(jsonify({'success': False, 'message': 'Not found'}), 404)
     try:
-        os.remove(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return make_response(jsonify({'success': False, 'message': 'Not found'}), 404)
+        _invalidate_repo_list(repo)
         try:
             base_name = os.path.splitext(filename)[0]
-            for f in os.listdir(repo):
-                if f.startswith(base_name + '_image'):
-                    try:
-                        os.remove(os.path.join(repo, f))
-                    except Exception:
-                        current_app.logger.exception(f'Failed to remove associated image {f}')
+            pattern = os.path.join(glob.escape(repo), glob.escape(base_name) + '_image*')
+            for f in glob.iglob(pattern):
+                try:
+                    os.remove(f)
+                except Exception:
+                    current_app.logger.exception(f'Failed to remove associated image {os.path.basename(f)}')
         except Exception:
             current_app.logger.exception('Failed to cleanup associated images')
         return {'success': True}
@@ -342,19 +615,19 @@ def repo_preview():
         data['printer'] = request.values.get('printer')
 
     try:
-        label = create_label_from_request(data)
-        im = label.generate(rotate=True)
+        png, etag = _render_preview_png(data, {}, _compress_level())
     except Exception as e:
-        current_app.logger.exception(e)
+        _log_request_error(e)
         return make_response(jsonify({'message': str(e)}), 400)
 
-    return _image_response(im, request.values.get('return_format', 'png'))
+    return _png_response(png, request.values.get('return_format', 'png'), etag)
 
 
 @bp.route('/api/repository/print', methods=['POST'])
 def repo_print():
+    values = request.values.to_dict(flat=True)
     jdata = request.get_json(force=True, silent=True) or {}
-    name = jdata.get('name') or request.values.get('name')
+    name = jdata.get('name') or values.get('name')
     if not name:
         return make_response(jsonify({'success': False, 'message': 'No name specified'}), 400)
     try:
@@ -365,34 +638,37 @@ def repo_print():
         current_app.logger.exception(e)
         return make_response(jsonify({'success': False, 'message': 'Failed to load file'}), 500)
 
-    if request.values.get('printer'):
-        data['printer'] = request.values.get('printer')
+    printer_arg = values.get('printer')
+    if printer_arg:
+        data['printer'] = printer_arg
 
     try:
-        device = request.values.get('printer') or current_app.config['PRINTER_PRINTER']
-        model = request.values.get('model') or current_app.config['PRINTER_MODEL']
-        label_size = data.get('label_size') or current_app.config['LABEL_DEFAULT_SIZE']
-        if device == '?' and current_app.config.get('PRINTER_SIMULATION', False):
+        config = current_app.config
+        device = printer_arg or config['PRINTER_PRINTER']
+        model = values.get('model') or config['PRINTER_MODEL']
+        label_size = data.get('label_size') or config['LABEL_DEFAULT_SIZE']
+        if device == '?' and config.get('PRINTER_SIMULATION', False):
             device = 'simulation'
         printer = PrinterQueue(model=model, device_specifier=device, label_size=label_size)
-        print_count = int(request.values.get('print_count') or data.get('print_count') or 1)
+        print_count = int(values.get('print_count') or data.get('print_count') or 1)
         if print_count < 1:
             raise ValueError("print_count must be greater than 0")
-        cut_once = int(request.values.get('cut_once') or data.get('cut_once') or 0) == 1
-        high_res = int(request.values.get('high_res') or data.get('high_res') or 0) != 0
+        cut_once = int(values.get('cut_once') or data.get('cut_once') or 0) == 1
+        high_res = int(values.get('high_res') or data.get('high_res') or 0) != 0
     except Exception as e:
-        current_app.logger.exception(e)
+        _log_request_error(e)
         return make_response(jsonify({'success': False, 'message': str(e)}), 400)
 
     status = ""
     try:
+        template = build_label_template(data)
         for i in range(print_count):
-            label = create_label_from_request(data, {}, i)
+            label = template.instantiate(i)
             cut = not cut_once or (cut_once and i == print_count - 1)
             printer.add_label_to_queue(label, cut, high_res)
         status = printer.process_queue()
     except Exception as e:
-        current_app.logger.exception(e)
+        _log_request_error(e)
         return make_response(jsonify({'success': False, 'message': str(e)}), 400)
 
     result = {'success': len(status) == 0}
@@ -7,15 +7,19 @@ application logic stays testable outside a request context.
 
 import os
 import logging
+import functools
 
+import orjson
 from PIL import Image
-from flask import current_app, json
+from flask import current_app
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 from brother_ql.labels import ALL_LABELS, FormFactor
 
 from .printer import PrinterQueue
 from .label import SimpleLabel, ShippingLabel, LabelContent, LabelOrientation, LabelType
+from .label_utils import has_dynamic_lines
+import app
 from app.utils import (
     convert_image_to_bw,
     convert_image_to_grayscale,
@@ -26,31 +30,160 @@ from app.utils import (
 
 DEFAULT_DPI = 300
 
+# brother_ql label definitions by identifier (e.g. '62', '62x29')
+_LABELS_BY_ID = {label.identifier: label for label in ALL_LABELS}
+
+# Label types by brother_ql form factor; anything else is round die-cut
+_LABEL_TYPES = {
+    FormFactor.ENDLESS: LabelType.ENDLESS_LABEL,
+    FormFactor.DIE_CUT: LabelType.DIE_CUT_LABEL,
+}
+
+# Print types that never draw an image; saved labels may still reference one
+_IMAGELESS_PRINT_TYPES = frozenset(('text', 'qrcode', 'qrcode_text', 'shipping'))
+
+# Address fields of shipping labels and the form keys they are sent as
+_SHIP_SENDER_FIELDS = tuple(
+    (field, 'ship_sender_' + field) for field in ('name', 'street', 'zip_city', 'country')
+)
+_SHIP_RECIPIENT_FIELDS = tuple(
+    (field, 'ship_recip_' + field) for field in ('company', 'name', 'street', 'zip_city', 'country')
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _supported_image_extensions() -> frozenset:
+    """
+    File extensions Pillow can open, e.g. '.png', '.jpg'. Computed on first
+    use: registered_extensions() loads every Pillow plugin.
+    """
+    return frozenset(ext for ext, fmt in Image.registered_extensions().items() if fmt in Image.OPEN)
+
+
+# ---------------------------------------------------------------------------
+# Request value helpers
+# ---------------------------------------------------------------------------
+
+def _int_value(d: dict, key: str, default: int) -> int:
+    """
+    Return ``d[key]`` as int, or ``default`` if it is missing or empty.
+    Values from saved labels are often ints already and are used as is.
+    """
+    value = d.get(key)
+    if type(value) is int:
+        return value
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+def _str_value(d: dict, key: str) -> str:
+    """Return ``d[key]`` stripped of surrounding whitespace, or ''."""
+    return (d.get(key) or '').strip()
+
+
+def _float_value(d: dict, key: str, default: float) -> float:
+    """Return ``d[key]`` as float, or ``default`` if it is missing or empty."""
+    value = d.get(key)
+    if type(value) is float:
+        return value
+    if value is None or value == '':
+        return default
+    return float(value)
+
+
+# ---------------------------------------------------------------------------
+# Image helpers
+# ---------------------------------------------------------------------------
+
+# Converters by image mode; any other mode prints black and white
+_IMAGE_MODE_CONVERTERS = {
+    'grayscale': lambda img, bw_threshold: convert_image_to_grayscale(img),
+    'red_and_black': lambda img, bw_threshold: convert_image_to_red_and_black(img),
+    'colored': lambda img, bw_threshold: img,
+}
+
+
+def _convert_by_mode(img: Image.Image, image_mode: str, bw_threshold: int) -> Image.Image:
+    """Convert ``img`` for printing according to the requested ``image_mode``."""
+    convert = _IMAGE_MODE_CONVERTERS.get(image_mode, convert_image_to_bw)
+    return convert(img, bw_threshold)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_repo_image(path: str, mtime_ns: int, image_mode: str, bw_threshold: int) -> Image.Image:
+    """
+    Decode and convert a repository image. ``mtime_ns`` is only part of the
+    cache key, so a saved-over image is read again. Labels never modify
+    their image in place, so the cached result is shared between renders.
+    """
+    with open(path, 'rb') as fh:
+        img = _convert_by_mode(imgfile_to_image(fh), image_mode, bw_threshold)
+    img.load()
+    return img
+
 
 # ---------------------------------------------------------------------------
 # Repository helpers
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=1024)
+def safe_filename(name: str) -> str:
+    """Memoized ``secure_filename``; the same few names are sanitized repeatedly."""
+    return secure_filename(name)
+
+
 def get_repo_dir() -> str:
     """Return (and create if necessary) the label repository directory."""
-    repo = current_app.config.get('LABEL_REPOSITORY_DIR')
-    if not repo:
-        repo = os.path.join(current_app.root_path, 'labels')
+    flask_app = current_app._get_current_object()
+    configured = flask_app.config.get('LABEL_REPOSITORY_DIR')
+    # The directory is created once per app and configured path
+    cached = flask_app.extensions.get('labeldesigner_repo_dir')
+    if cached is not None and cached[0] == configured:
+        return cached[1]
+    repo = configured or os.path.join(flask_app.root_path, 'labels')
     os.makedirs(repo, exist_ok=True)
+    flask_app.extensions['labeldesigner_repo_dir'] = (configured, repo)
     return repo
 
 
 def load_repo_json(name: str) -> dict:
-    """Load a repository JSON file by name. Raises FileNotFoundError if absent."""
-    filename = secure_filename(name)
+    """
+    Load a repository JSON file by name. Raises FileNotFoundError if absent.
+
+    ``text`` is left as the parsed list of lines, which
+    :func:`create_label_from_request` accepts as well as the JSON string
+    sent by the designer form.
+    """
+    return load_repo_label(name)[0]
+
+
+def load_repo_label(name: str) -> tuple:
+    """
+    Like :func:`load_repo_json`, but also return the text lines serialized
+    as the JSON string the designer form works with.
+    """
+    filename = safe_filename(name)
     repo = get_repo_dir()
     path = os.path.join(repo, filename)
-    if not os.path.exists(path):
-        raise FileNotFoundError(name)
-    with open(path, 'r', encoding='utf-8') as fh:
-        data = json.load(fh)
-        data['text'] = json.dumps(data.get('text', []))
-        return data
+    try:
+        st = os.stat(path)
+        data, text_json = _read_repo_json(path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        raise FileNotFoundError(name) from None
+    # Shallow copy: callers only set top-level keys such as 'printer'
+    return dict(data), text_json
+
+
+@functools.lru_cache(maxsize=64)
+def _read_repo_json(path: str, mtime_ns: int, size: int) -> tuple:
+    """Parse a repository file; the stat values only key the cache."""
+    with open(path, 'rb', buffering=0) as fh:
+        data = orjson.loads(fh.read())
+    text = data.setdefault('text', [])
+    # Empty labels are common; skip serializing them
+    text_json = orjson.dumps(text).decode('utf-8') if text else '[]'
+    return data, text_json
 
 
 # ---------------------------------------------------------------------------
@@ -59,12 +192,14 @@ def load_repo_json(name: str) -> dict:
 
 def get_label_dimensions(label_size: str, high_res: bool = False):
     """Return (width, height) in printer dots for the given label identifier."""
-    dimensions = next(
-        (label.dots_printable for label in ALL_LABELS if label.identifier == label_size),
-        None,
-    )
-    if dimensions is None:
+    label = _LABELS_BY_ID.get(label_size)
+    if label is None:
         raise LookupError("Unknown label_size")
+    return _label_dimensions(label, high_res)
+
+
+def _label_dimensions(label, high_res: bool) -> list:
+    dimensions = label.dots_printable
     if high_res:
         return [2 * dimensions[0], 2 * dimensions[1]]
     return list(dimensions)
@@ -80,9 +215,10 @@ def create_printer_from_request(values: dict) -> PrinterQueue:
     (e.g. ``request.values.to_dict(flat=True)``).
     """
     label_size = values.get('label_size', '62')
-    device = values.get('printer') or current_app.config['PRINTER_PRINTER']
-    model = values.get('model') or current_app.config['PRINTER_MODEL']
-    if device == '?' and current_app.config.get('PRINTER_SIMULATION', False):
+    config = current_app.config
+    device = values.get('printer') or config['PRINTER_PRINTER']
+    model = values.get('model') or config['PRINTER_MODEL']
+    if device == '?' and config.get('PRINTER_SIMULATION', False):
         device = 'simulation'
     return PrinterQueue(model=model, device_specifier=device, label_size=label_size)
 
@@ -91,66 +227,127 @@ def create_printer_from_request(values: dict) -> PrinterQueue:
 # Label factory
 # ---------------------------------------------------------------------------
 
-def create_label_from_request(d: dict = {}, files: dict = {}, counter: int = 0):
+def _parse_text_lines(text) -> list:
+    """
+    Return the text lines of a request as a list of fresh dicts. ``text``
+    is either the JSON string posted by the designer or an already parsed
+    list (repository labels); the input is never modified.
+    """
+    if isinstance(text, (str, bytes)):
+        # An empty field means no lines, like a missing one
+        return orjson.loads(text) if text else []
+    return [dict(line) for line in text or []]
+
+
+class LabelTemplate:
+    """
+    A parsed label request, ready to be turned into labels.
+
+    Everything that does not depend on the copy number (form values, font
+    paths, uploaded or repository images) is resolved once when the template
+    is built, so printing several copies only creates the label objects.
+    """
+
+    def __init__(self, label_class, kwargs: dict):
+        self.label_class = label_class
+        self._kwargs = kwargs
+        # Without templates or shifted text every copy renders identically
+        self.static = label_class is not SimpleLabel or not has_dynamic_lines(kwargs.get('text') or [])
+        self._label = None
+
+    def instantiate(self, counter: int = 0):
+        """
+        Return the label for copy number ``counter`` (used by {{counter}}).
+        Static templates return the same label object for every copy, which
+        lets the print queue render it only once.
+        """
+        if self.static:
+            if self._label is None:
+                self._label = self._create(counter)
+            return self._label
+        return self._create(counter)
+
+    def _create(self, counter: int):
+        if self.label_class is SimpleLabel:
+            return SimpleLabel(counter=counter, **self._kwargs)
+        return self.label_class(**self._kwargs)
+
+
+def create_label_from_request(d: dict = None, files: dict = None, counter: int = 0):
     """
     Build a SimpleLabel or ShippingLabel from a flat dict ``d`` and an
     optional ``files`` dict (mapping field name → FileStorage).
     """
-    from app import FONTS  # deferred to avoid circular import at module load
+    return build_label_template(d, files).instantiate(counter)
+
+
+def build_label_template(d: dict = None, files: dict = None) -> LabelTemplate:
+    """
+    Parse a flat dict ``d`` and an optional ``files`` dict into a
+    :class:`LabelTemplate` that can be instantiated once per copy.
+    """
+    d = d or {}
+    files = files or {}
+    # Read at call time: every create_app() installs its own font list
+    fonts = app.FONTS
 
     label_size = d.get('label_size', "62")
-    kind = next((label.form_factor for label in ALL_LABELS if label.identifier == label_size), None)
-    if kind is None:
+    label = _LABELS_BY_ID.get(label_size)
+    if label is None:
         raise LookupError("Unknown label_size")
+    kind = label.form_factor
 
     context = {
         'label_size': label_size,
         'print_type': d.get('print_type', 'text'),
         'label_orientation': d.get('orientation', 'standard'),
         'kind': kind,
-        'margin_top': int(d.get('margin_top', 12)),
-        'margin_bottom': int(d.get('margin_bottom', 12)),
-        'margin_left': int(d.get('margin_left', 20)),
-        'margin_right': int(d.get('margin_right', 20)),
-        'border_thickness': int(d.get('border_thickness', 1)),
-        'border_roundness': int(d.get('border_roundness', 0)),
-        'border_distanceX': int(d.get('border_distance_x', 0)),
-        'border_distanceY': int(d.get('border_distance_y', 0)),
+        'margin_top': _int_value(d, 'margin_top', 12),
+        'margin_bottom': _int_value(d, 'margin_bottom', 12),
+        'margin_left': _int_value(d, 'margin_left', 20),
+        'margin_right': _int_value(d, 'margin_right', 20),
+        'border_thickness': _int_value(d, 'border_thickness', 1),
+        'border_roundness': _int_value(d, 'border_roundness', 0),
+        'border_distanceX': _int_value(d, 'border_distance_x', 0),
+        'border_distanceY': _int_value(d, 'border_distance_y', 0),
         'border_color': d.get('border_color', 'black'),
-        'text': json.loads(d.get('text', '[]')),
+        'text': _parse_text_lines(d.get('text', '[]')),
         'barcode_type': d.get('barcode_type') or 'QR',
-        'qrcode_size': int(d.get('qrcode_size', 10)),
+        'qrcode_size': _int_value(d, 'qrcode_size', 10),
         'qrcode_correction': d.get('qrcode_correction', 'L'),
         'image_mode': d.get('image_mode', "grayscale"),
-        'image_bw_threshold': int(d.get('image_bw_threshold', 70)),
-        'image_fit': int(d.get('image_fit', 1)) > 0,
-        'image_scaling_factor': float(d.get('image_scaling_factor', 100.0)),
-        'image_rotation': int(d.get('image_rotation', 0)),
+        'image_bw_threshold': _int_value(d, 'image_bw_threshold', 70),
+        'image_fit': _int_value(d, 'image_fit', 1) > 0,
+        'image_scaling_factor': _float_value(d, 'image_scaling_factor', 100.0),
+        'image_rotation': _int_value(d, 'image_rotation', 0),
         'print_color': d.get('print_color', 'black'),
-        'timestamp': int(d.get('timestamp', 0)),
-        'high_res': int(d.get('high_res', 0)) != 0,
-        'code_text': d.get('code_text', '').strip(),
+        'timestamp': _int_value(d, 'timestamp', 0),
+        'high_res': _int_value(d, 'high_res', 0) != 0,
+        'code_text': _str_value(d, 'code_text'),
     }
 
+    fast = current_app.config.get('IMAGE_FAST_RENDERING', False)
+
     def _get_uploaded_image(image: FileStorage) -> Image.Image:
         name, ext = os.path.splitext(image.filename)
         ext = ext.lower()
+        # Fitting only ever shrinks an image that covers the whole label, so
+        # it may be decoded at that size instead of at full resolution
+        min_size = max(width, height) if fast and context['image_fit'] else 0
         if ext == '.pdf':
-            img = pdffile_to_image(image, DEFAULT_DPI)
-            if context['image_mode'] == 'grayscale':
-                return convert_image_to_grayscale(img)
-            return convert_image_to_bw(img, context['image_bw_threshold'])
-        exts = Image.registered_extensions()
-        supported_extensions = {ex for ex, f in exts.items() if f in Image.OPEN}
-        if ext in supported_extensions:
+            img = pdffile_to_image(image, DEFAULT_DPI, min_size, grayscale=fast)
+            # PDFs are only ever printed in grayscale or black/white
+            image_mode = 'grayscale' if context['image_mode'] == 'grayscale' else 'bw'
+            return _convert_by_mode(img, image_mode, context['image_bw_threshold'])
+        if ext in _supported_image_extensions():
             img = imgfile_to_image(image)
-            if context['image_mode'] == 'grayscale':
-                return convert_image_to_grayscale(img)
-            elif context['image_mode'] == 'red_and_black':
-                return convert_image_to_red_and_black(img)
-            elif context['image_mode'] == 'colored':
-                return img
-            return convert_image_to_bw(img, context['image_bw_threshold'])
+            if min_size > 0:
+                # JPEG only: let libjpeg scale down while decoding
+                img.draft('RGB' if context['image_mode'] == 'colored' else 'L', (min_size, min_size))
+            img = _convert_by_mode(img, context['image_mode'], context['image_bw_threshold'])
+            # Decode now, while the upload is open and before renders share it
+            img.load()
+            return img
         raise ValueError("Unsupported file type")
 
     # Resolve label content type
@@ -175,27 +372,32 @@ def create_label_from_request(d: dict = {}, files: dict = {}, counter: int = 0):
     label_orientation = (LabelOrientation.ROTATED
                          if context['label_orientation'] == 'rotated'
                          else LabelOrientation.STANDARD)
-    if context['kind'] == FormFactor.ENDLESS:
-        label_type = LabelType.ENDLESS_LABEL
-    elif context['kind'] == FormFactor.DIE_CUT:
-        label_type = LabelType.DIE_CUT_LABEL
-    else:
-        label_type = LabelType.ROUND_DIE_CUT_LABEL
+    label_type = _LABEL_TYPES.get(context['kind'], LabelType.ROUND_DIE_CUT_LABEL)
 
-    width, height = get_label_dimensions(context['label_size'], context['high_res'])
-    if height > width:
-        width, height = height, width
+    # Landscape for standard orientation, portrait when rotated
+    dimensions = _label_dimensions(label, context['high_res'])
+    width, height = max(dimensions), min(dimensions)
     if label_orientation == LabelOrientation.ROTATED:
         height, width = width, height
 
-    # Resolve font paths for text lines
+    # Resolve font paths for text lines; labels tend to reuse one or two fonts
+    font_paths = {}
     for line in context['text']:
-        if 'size' not in line or not str(line['size']).isdigit():
-            current_app.logger.error(line)
-            raise ValueError("Font size is required")
-        if int(line['size']) < 1:
+        size = line.get('size')
+        if type(size) is not int:
+            if not str(size).isdigit():
+                current_app.logger.error(line)
+                raise ValueError("Font size is required")
+            size = int(size)
+        if size < 1:
             raise ValueError("Font size must be at least 1")
-        line['path'] = FONTS.get_path(line.get('font', ''))
+        # Store the parsed size so renderers and the font cache see one type
+        line['size'] = size
+        font = line.get('font', '')
+        path = font_paths.get(font)
+        if path is None:
+            path = font_paths[font] = fonts.get_path(font)
+        line['path'] = path
         if len(line.get('text', '')) > 10_000:
             raise ValueError("Text is too long")
 
@@ -205,32 +407,31 @@ def create_label_from_request(d: dict = {}, files: dict = {}, counter: int = 0):
     # Resolve image
     uploaded = files.get('image', None)
     image = None
+    # Repository images are cached and shared between requests
+    shared_image = False
     if uploaded is not None:
         image = _get_uploaded_image(uploaded)
-    else:
+    elif print_type not in _IMAGELESS_PRINT_TYPES:
         image_ref = d.get('image')
         if isinstance(image_ref, str) and len(image_ref) > 0:
             try:
                 repo = get_repo_dir()
-                image_path = os.path.join(repo, secure_filename(image_ref))
-                if os.path.exists(image_path):
-                    with open(image_path, 'rb') as fh:
-                        pil_img = imgfile_to_image(fh)
-                    if context['image_mode'] == 'grayscale':
-                        image = convert_image_to_grayscale(pil_img)
-                    elif context['image_mode'] == 'red_and_black':
-                        image = convert_image_to_red_and_black(pil_img)
-                    elif context['image_mode'] == 'colored':
-                        image = pil_img
-                    else:
-                        image = convert_image_to_bw(pil_img, context['image_bw_threshold'])
+                image_path = os.path.join(repo, safe_filename(image_ref))
+                try:
+                    mtime_ns = os.stat(image_path).st_mtime_ns
+                except FileNotFoundError:
+                    mtime_ns = None
+                if mtime_ns is not None:
+                    image = _load_repo_image(image_path, mtime_ns, context['image_mode'],
+                                             context['image_bw_threshold'])
+                    shared_image = True
             except Exception:
                 current_app.logger.exception('Failed to load repository image')
 
     # Build shipping label
     if print_type == 'shipping':
-        default_family, default_style = FONTS.get_default_font()
-        default_font_path = FONTS.get_path(f"{default_family},{default_style}")
+        default_family, default_style = fonts.get_default_font()
+        default_font_path = fonts.get_path(f"{default_family},{default_style}")
         sender_font_path = context['text'][0].get('path', default_font_path) if context['text'] else default_font_path
         recipient_font_path = context['text'][1].get('path', sender_font_path) if len(context['text']) > 1 else sender_font_path
         sender_font_size = int(context['text'][0].get('size', 0)) if context['text'] else 0
@@ -241,61 +442,50 @@ def create_label_from_request(d: dict = {}, files: dict = {}, counter: int = 0):
             label_orientation = LabelOrientation.ROTATED
             width, height = height, width
 
-        ml = int(context['margin_left'])
-        mr = int(context['margin_right'])
-        mt = int(context['margin_top'])
-        mb = int(context['margin_bottom'])
+        ml = context['margin_left']
+        mr = context['margin_right']
+        mt = context['margin_top']
+        mb = context['margin_bottom']
 
-        return ShippingLabel(
+        return LabelTemplate(ShippingLabel, dict(
             width=width,
             height=height,
             label_type=label_type,
             label_orientation=label_orientation,
-            sender={
-                'name':     d.get('ship_sender_name', '').strip(),
-                'street':   d.get('ship_sender_street', '').strip(),
-                'zip_city': d.get('ship_sender_zip_city', '').strip(),
-                'country':  d.get('ship_sender_country', '').strip(),
-            },
-            recipient={
-                'company':  d.get('ship_recip_company', '').strip(),
-                'name':     d.get('ship_recip_name', '').strip(),
-                'street':   d.get('ship_recip_street', '').strip(),
-                'zip_city': d.get('ship_recip_zip_city', '').strip(),
-                'country':  d.get('ship_recip_country', '').strip(),
-            },
-            tracking_number=d.get('ship_tracking', '').strip(),
+            sender={field: _str_value(d, key) for field, key in _SHIP_SENDER_FIELDS},
+            recipient={field: _str_value(d, key) for field, key in _SHIP_RECIPIENT_FIELDS},
+            tracking_number=_str_value(d, 'ship_tracking'),
             font_path=recipient_font_path,
             sender_font_path=sender_font_path,
             tracking_barcode_type=context['barcode_type'],
             sender_font_size=sender_font_size,
             recipient_font_size=recipient_font_size,
             margin=(ml, mr, mt, mb),
-            section_spacing=int(d.get('ship_section_spacing', 0) or 0),
-            barcode_scale=int(d.get('ship_barcode_scale', 0) or 0),
-            barcode_show_text=bool(int(d.get('ship_barcode_show_text', 0) or 0)),
-            from_label=d.get('ship_from_label', '').strip(),
-            to_label=d.get('ship_to_label', '').strip(),
-            recipient_border=bool(int(d.get('ship_recip_border', 0) or 0)),
+            section_spacing=_int_value(d, 'ship_section_spacing', 0),
+            barcode_scale=_int_value(d, 'ship_barcode_scale', 0),
+            barcode_show_text=bool(_int_value(d, 'ship_barcode_show_text', 0)),
+            from_label=_str_value(d, 'ship_from_label'),
+            to_label=_str_value(d, 'ship_to_label'),
+            recipient_border=bool(_int_value(d, 'ship_recip_border', 0)),
             border_thickness=context['border_thickness'],
             border_roundness=context['border_roundness'],
             border_distance=(context['border_distanceX'], context['border_distanceY']),
             sender_line_spacing=sender_line_spacing,
             recipient_line_spacing=recipient_line_spacing,
-        )
+        ))
 
     # Build simple label
-    return SimpleLabel(
+    return LabelTemplate(SimpleLabel, dict(
         width=width,
         height=height,
         label_content=label_content,
         label_orientation=label_orientation,
         label_type=label_type,
         label_margin=(
-            int(context['margin_left']),
-            int(context['margin_right']),
-            int(context['margin_top']),
-            int(context['margin_bottom'])
+            context['margin_left'],
+            context['margin_right'],
+            context['margin_top'],
+            context['margin_bottom']
         ),
         fore_color=fore_color,
         text=context['text'],
@@ -311,6 +501,7 @@ def create_label_from_request(d: dict = {}, files: dict = {}, counter: int = 0):
         border_distance=(context['border_distanceX'], context['border_distanceY']),
         border_color=border_color,
         timestamp=context['timestamp'],
-        counter=counter,
-        code_text=context['code_text']
-    )
+        code_text=context['code_text'],
+        fast_rendering=fast,
+        shared_image=shared_image,
+    ))
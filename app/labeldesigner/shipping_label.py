@@ -1,7 +1,8 @@
 """ShippingLabel — structured sender/recipient label renderer."""
 
+import functools
 import logging
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Tuple
 
 from PIL import Image, ImageDraw, ImageFont
 from qrcode import QRCode, constants
@@ -9,15 +10,93 @@ import barcode
 from barcode.writer import ImageWriter
 
 from .enums import LabelContent, LabelType, LabelOrientation
-from .label_utils import FONT_CACHE, _draw_dashed_line
+from .label_utils import load_font, _paste_dashed_line, MEASURE_DRAW
 
 logger = logging.getLogger(__name__)
 
+# Recipient address lines in drawing order; the first three are set apart
+# from the line above them
+_RECIPIENT_FIELDS = ('company', 'name', 'street', 'zip_city', 'country')
+_RECIPIENT_SPACED_FIELDS = ('company', 'name', 'street')
+
+
+@functools.lru_cache(maxsize=128)
+def _render_tracking_code(tracking_number: str, bc_type: str, write_text: bool) -> Image.Image:
+    """
+    Render a tracking-number barcode or QR code. Reprints of the same
+    tracking number reuse the image; callers only read it (resize/rotate).
+    Codes are black on white, so QR codes stay in qrcode's native 1-bit
+    mode (they are only ever scaled with NEAREST) and barcodes are drawn
+    straight into a single-channel 'L' image.
+    """
+    if bc_type == 'qr':
+        qr = QRCode(
+            version=1,
+            error_correction=constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=1,
+        )
+        qr.add_data(tracking_number)
+        qr.make(fit=True)
+        return qr.make_image(fill_color='black', back_color='white').get_image()
+    try:
+        bc_class = barcode.get_barcode_class(bc_type)
+    except Exception:
+        bc_class = barcode.get_barcode_class('code128')
+    bc_obj = bc_class(tracking_number, writer=ImageWriter(mode='L'))
+    return bc_obj.render(writer_options={'write_text': write_text, 'quiet_zone': 2})
+
+
+def _text_measurer():
+    """
+    Return a ``measure(text, font) -> (width, height)`` function for text
+    drawn with ``anchor='lt'``. The bounding box only shifts with the origin,
+    so each (text, font) pair is measured once at (0, 0) and remembered.
+    """
+    draw = MEASURE_DRAW
+    sizes = {}
+
+    def measure(text: str, font) -> Tuple[int, int]:
+        key = (text, font)
+        size = sizes.get(key)
+        if size is None:
+            bb = draw.textbbox((0, 0), text, font=font, anchor='lt')
+            size = sizes[key] = (bb[2] - bb[0], bb[3] - bb[1])
+        return size
+
+    return measure
+
+
+def _layout_lines(measure, lines_list, ls_px: int = 0):
+    """
+    Stack ``(text, font, color, extra_top)`` lines from the top of a block.
+    Returns ``(text, font, color, y)`` for every non-empty line, with ``y``
+    relative to the block top, and the height of the block.
+    """
+    placed = []
+    y = 0
+    for text, font, color, extra_top in lines_list:
+        if not text:
+            continue
+        y += extra_top
+        placed.append((text, font, color, y))
+        y += measure(text, font)[1] + ls_px
+    return placed, y
+
+
+def _barcode_resample(src_width: int, dst_width: int) -> Image.Resampling:
+    """
+    Filter for scaling a rendered 1D barcode: a box average is enough (and
+    much cheaper than LANCZOS) when shrinking; enlarging keeps LANCZOS.
+    """
+    return Image.Resampling.BOX if dst_width <= src_width else Image.Resampling.LANCZOS
+
 
 class ShippingLabel:
     """
     Renders a structured shipping label with sender, recipient address blocks
-    and an optional tracking-number barcode/QR code.
+    and an optional tracking-number barcode/QR code. The label only uses
+    shades of gray, so it is drawn as a single-channel 'L' image.
     """
 
     def __init__(
@@ -53,6 +132,14 @@ class ShippingLabel:
         self._label_orientation = label_orientation
         self.sender = sender
         self.recipient = recipient
+        # Address lines are fixed for the label's lifetime; resolve them once
+        # instead of on every layout pass
+        self._sender_name = sender.get('name') or ''
+        self._sender_street = sender.get('street') or ''
+        self._sender_address = ' \u00b7 '.join(
+            p for p in (sender.get('zip_city'), sender.get('country')) if p)
+        self._recipient_lines = tuple(
+            (field, recipient[field]) for field in _RECIPIENT_FIELDS if recipient.get(field))
         self.tracking_number = tracking_number
         self._font_path = font_path
         self._sender_font_path = sender_font_path or font_path
@@ -88,13 +175,8 @@ class ShippingLabel:
         path = font_path or self._font_path
         if not path:
             return ImageFont.load_default()
-        key = (path, size)
-        if key in FONT_CACHE:
-            return FONT_CACHE[key]
         try:
-            font = ImageFont.truetype(path, size)
-            FONT_CACHE[key] = font
-            return font
+            return load_font(path, size)
         except Exception as e:
             logger.error(f"ShippingLabel: failed to load font '{path}' size {size}: {e}")
             return ImageFont.load_default()
@@ -104,25 +186,10 @@ class ShippingLabel:
         if not self.tracking_number:
             return None
         bc_type = self._tracking_barcode_type
-        if bc_type == 'qr':
-            qr = QRCode(
-                version=1,
-                error_correction=constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=1,
-            )
-            qr.add_data(self.tracking_number)
-            qr.make(fit=True)
-            return qr.make_image(fill_color='black', back_color='white').convert('RGB')
-        else:
-            try:
-                bc_class = barcode.get_barcode_class(bc_type)
-            except Exception:
-                bc_class = barcode.get_barcode_class('code128')
-            bc_obj = bc_class(self.tracking_number, writer=ImageWriter())
-            return bc_obj.render(writer_options={'write_text': write_text, 'quiet_zone': 2}).convert('RGB')
-
-    def generate(self, rotate: bool = False) -> Image.Image:
+        # QR codes never carry the number as text
+        return _render_tracking_code(self.tracking_number, bc_type, write_text and bc_type != 'qr')
+
+    def generate(self, rotate: bool = False, preview: bool = False) -> Image.Image:
         if self._label_type == LabelType.ENDLESS_LABEL:
             return self._generate_landscape()
         return self._generate_portrait()
@@ -140,22 +207,18 @@ class ShippingLabel:
         canvas_h = max(self._height, 1)
         usable_h = max(canvas_h - mt - mb, 1)
 
-        COLOR_GRAY = (130, 130, 130)
-        COLOR_BLACK = (0, 0, 0)
+        COLOR_GRAY = 130
+        COLOR_BLACK = 0
         DIVIDER_GAP = (self._section_spacing if self._section_spacing > 0
                        else max(int(usable_h * 0.04), 24))
         CODE_GAP = max(int(usable_h * 0.03), 20)
 
-        n_recip = sum(1 for k in ('company', 'name', 'street', 'zip_city', 'country')
-                      if self.recipient.get(k))
-        n_recip = max(1, min(5, n_recip))
+        n_recip = max(1, len(self._recipient_lines))
         line_h = usable_h / (n_recip + 0.5)
 
         sfp = self._sender_font_path
 
-        # Dummy canvas for text measurement
-        dummy = Image.new('RGB', (16000, canvas_h), 'white')
-        draw_m = ImageDraw.Draw(dummy)
+        measure = _text_measurer()
 
         def _compute_sizes(scale: float = 1.0):
             """
@@ -184,78 +247,51 @@ class ShippingLabel:
                 self._get_font(sz_tracking),
             )
 
-        def _build_lines(font_from, font_sender, font_to, font_rname, font_rdetail):
-            _sender: List[Tuple[str, Any, Tuple, int]] = [
-                (self._from_label, font_from, COLOR_GRAY, 0),
-            ]
-            for field, base_pad in [
-                (self.sender.get('name', ''), 4),
-                (self.sender.get('street', ''), 0),
-            ]:
-                if field:
-                    _sender.append((field, font_sender, COLOR_BLACK, base_pad))
-            addr_parts = [p for p in [self.sender.get('zip_city'), self.sender.get('country')] if p]
-            if addr_parts:
-                _sender.append((' \u00b7 '.join(addr_parts), font_sender, COLOR_BLACK, 0))
-
-            _recip: List[Tuple[str, Any, Tuple, int]] = [
-                (self._to_label, font_to, COLOR_GRAY, 0),
-            ]
-            if self.recipient.get('company'):
-                _recip.append((self.recipient['company'], font_rdetail, COLOR_BLACK, 6))
-            if self.recipient.get('name'):
-                _recip.append((self.recipient['name'], font_rname, COLOR_BLACK, 6))
-            if self.recipient.get('street'):
-                _recip.append((self.recipient['street'], font_rdetail, COLOR_BLACK, 6))
-            if self.recipient.get('zip_city'):
-                _recip.append((self.recipient['zip_city'], font_rdetail, COLOR_BLACK, 0))
-            if self.recipient.get('country'):
-                _recip.append((self.recipient['country'], font_rdetail, COLOR_BLACK, 0))
-            return _sender, _recip
-
-        def _block_height(lines_list, ls_px=0) -> int:
-            total = 0
-            for text, font, _, extra_top in lines_list:
-                if not text:
-                    continue
-                bb = draw_m.textbbox((0, 0), text or ' ', font=font, anchor='lt')
-                total += extra_top + (bb[3] - bb[1]) + ls_px
-            return total
+        # Address lines with the index of their font in _load_fonts' result;
+        # only the fonts change when the blocks are rescaled
+        F_RNAME, F_RDETAIL, F_TO, F_SENDER, F_FROM, F_TRACKING = range(6)
+        sender_spec = [(self._from_label, F_FROM, COLOR_GRAY, 0)]
+        if self._sender_name:
+            sender_spec.append((self._sender_name, F_SENDER, COLOR_BLACK, 4))
+        if self._sender_street:
+            sender_spec.append((self._sender_street, F_SENDER, COLOR_BLACK, 0))
+        if self._sender_address:
+            sender_spec.append((self._sender_address, F_SENDER, COLOR_BLACK, 0))
+        recip_spec = [(self._to_label, F_TO, COLOR_GRAY, 0)]
+        for field, value in self._recipient_lines:
+            recip_spec.append((value, F_RNAME if field == 'name' else F_RDETAIL, COLOR_BLACK,
+                               6 if field in _RECIPIENT_SPACED_FIELDS else 0))
+
+        def _size_blocks(scale: float):
+            """Load fonts for ``scale`` and lay out both address blocks with them."""
+            sizes = _compute_sizes(scale)
+            fonts = _load_fonts(sizes)
+            sender_ls_px = max(0, int(sizes[F_SENDER] * (self._sender_line_spacing - 100) / 100))
+            recip_ls_px = max(0, int(sizes[F_RDETAIL] * (self._recipient_line_spacing - 100) / 100))
+            sender_lines = [(text, fonts[f], color, extra) for text, f, color, extra in sender_spec]
+            recip_lines = [(text, fonts[f], color, extra) for text, f, color, extra in recip_spec]
+            return (fonts[F_TRACKING],
+                    _layout_lines(measure, sender_lines, sender_ls_px),
+                    _layout_lines(measure, recip_lines, recip_ls_px))
 
         # --- Initial sizing ---
-        sizes = _compute_sizes(1.0)
-        sz_rname, sz_rdetail, sz_to, sz_sender, sz_from, sz_tracking = sizes
-        font_rname, font_rdetail, font_to, font_sender, font_from, font_tracking = _load_fonts(sizes)
-
-        sender_ls_px = max(0, int(sz_sender * (self._sender_line_spacing - 100) / 100))
-        recip_ls_px = max(0, int(sz_rdetail * (self._recipient_line_spacing - 100) / 100))
-
-        sender_lines, recip_lines = _build_lines(font_from, font_sender, font_to, font_rname, font_rdetail)
+        font_tracking, (sender_layout, sender_block_h), (recip_layout, recip_block_h) = _size_blocks(1.0)
 
         # --- Auto-scale down if blocks overflow available height ---
-        max_block_h = max(_block_height(sender_lines, sender_ls_px),
-                          _block_height(recip_lines, recip_ls_px))
+        max_block_h = max(sender_block_h, recip_block_h)
         if max_block_h > usable_h:
             scale = (usable_h / max_block_h) * 0.94
-            sizes = _compute_sizes(scale)
-            sz_rname, sz_rdetail, sz_to, sz_sender, sz_from, sz_tracking = sizes
-            font_rname, font_rdetail, font_to, font_sender, font_from, font_tracking = _load_fonts(sizes)
-            sender_ls_px = max(0, int(sz_sender * (self._sender_line_spacing - 100) / 100))
-            recip_ls_px = max(0, int(sz_rdetail * (self._recipient_line_spacing - 100) / 100))
-            sender_lines, recip_lines = _build_lines(font_from, font_sender, font_to, font_rname, font_rdetail)
+            font_tracking, (sender_layout, sender_block_h), (recip_layout, recip_block_h) = _size_blocks(scale)
 
         # --- Column widths ---
-        def col_width(lines_list, min_w: int) -> int:
+        def col_width(layout, min_w: int) -> int:
             max_w = min_w
-            for text, font, _, _ in lines_list:
-                if not text:
-                    continue
-                bb = draw_m.textbbox((0, 0), text, font=font, anchor='lt')
-                max_w = max(max_w, bb[2] - bb[0])
+            for text, font, _, _ in layout:
+                max_w = max(max_w, measure(text, font)[0])
             return max_w
 
-        sender_col_w = col_width(sender_lines, 100)
-        recip_col_w = col_width(recip_lines, 300)
+        sender_col_w = col_width(sender_layout, 100)
+        recip_col_w = col_width(recip_layout, 300)
 
         # --- Tracking barcode ---
         code_img = None
@@ -269,53 +305,40 @@ class ShippingLabel:
                 _bscale = (self._barcode_scale / 100.0) if self._barcode_scale > 0 else 1.0
                 if self._tracking_barcode_type == 'qr':
                     side = max(int(usable_h * 0.85 * _bscale), 8)
-                    code_img = raw_code.resize((side, side), Image.Resampling.LANCZOS)
+                    code_img = raw_code.resize((side, side), Image.Resampling.NEAREST)
                 else:
-                    rotated = raw_code.rotate(90, expand=True)
+                    rotated = raw_code.transpose(Image.Transpose.ROTATE_90)
                     target_h = max(int(usable_h * _bscale), 8)
                     sc = target_h / rotated.height
                     new_w = max(int(rotated.width * sc), 1)
-                    code_img = rotated.resize((new_w, target_h), Image.Resampling.LANCZOS)
+                    code_img = rotated.resize((new_w, target_h),
+                                              _barcode_resample(rotated.width, new_w))
 
-                tb = draw_m.textbbox((0, 0), self.tracking_number, font=font_tracking, anchor='lt')
-                tracking_tw = tb[2] - tb[0]
-                tracking_th = tb[3] - tb[1]
+                tracking_tw, tracking_th = measure(self.tracking_number, font_tracking)
                 code_col_w = CODE_GAP + max(code_img.width, tracking_tw)
 
         # --- Build final canvas ---
         canvas_w = (ml + sender_col_w + DIVIDER_GAP + 1 + DIVIDER_GAP
                     + recip_col_w + code_col_w + mr)
-        img = Image.new('RGB', (canvas_w, canvas_h), 'white')
+        img = Image.new('L', (canvas_w, canvas_h), 255)
         draw = ImageDraw.Draw(img)
 
         # Draw sender (centered vertically)
-        sender_block_h = _block_height(sender_lines, sender_ls_px)
-        y = mt + max((usable_h - sender_block_h) // 2, 0)
-        for text, font, color, extra_top in sender_lines:
-            if not text:
-                continue
-            y += extra_top
-            draw.text((ml, y), text, fill=color, font=font, anchor='lt')
-            bb = draw.textbbox((ml, y), text, font=font, anchor='lt')
-            y += bb[3] - bb[1] + sender_ls_px
+        sender_y = mt + max((usable_h - sender_block_h) // 2, 0)
+        for text, font, color, dy in sender_layout:
+            draw.text((ml, sender_y + dy), text, fill=color, font=font, anchor='lt')
 
         # Divider line
         div_x = ml + sender_col_w + DIVIDER_GAP
-        _draw_dashed_line(draw, div_x, mt, div_x, canvas_h - mb,
-                          fill=(180, 180, 180), width=2, dash_len=10, gap_len=6)
+        _paste_dashed_line(img, div_x, mt, div_x, canvas_h - mb,
+                           fill=180, width=2, dash_len=10, gap_len=6)
 
         # Draw recipient
         rx = div_x + 1 + DIVIDER_GAP
-        y = mt
-        recip_block_y_start = y
-        for text, font, color, extra_top in recip_lines:
-            if not text:
-                continue
-            y += extra_top
-            draw.text((rx, y), text, fill=color, font=font, anchor='lt')
-            bb = draw.textbbox((rx, y), text, font=font, anchor='lt')
-            y += bb[3] - bb[1] + recip_ls_px
-        recip_block_y_end = y
+        recip_block_y_start = mt
+        for text, font, color, dy in recip_layout:
+            draw.text((rx, recip_block_y_start + dy), text, fill=color, font=font, anchor='lt')
+        recip_block_y_end = recip_block_y_start + recip_block_h
 
         if self._recipient_border and self._border_thickness > 0:
             bw = self._border_thickness
@@ -359,8 +382,8 @@ class ShippingLabel:
         S_SCALE = (self._sender_font_size / 48.0) if self._sender_font_size > 0 else 1.0
         R_SCALE = (self._recipient_font_size / 48.0) if self._recipient_font_size > 0 else 1.0
 
-        COLOR_GRAY = (130, 130, 130)
-        COLOR_BLACK = (0, 0, 0)
+        COLOR_GRAY = 130
+        COLOR_BLACK = 0
         DIVIDER_H = (self._section_spacing if self._section_spacing > 0
                      else max(int(usable_width * 0.04), 18))
 
@@ -373,33 +396,25 @@ class ShippingLabel:
 
         font_section, font_sender, font_rname, font_rdetail = _build_portrait_fonts(1.0)
 
-        dummy = Image.new('RGB', (max(self._width, 1), 20), 'white')
-        draw_m = ImageDraw.Draw(dummy)
+        measure = _text_measurer()
 
         def build_lines(font_section, font_sender, font_rname, font_rdetail):
-            _sender: List[Tuple[str, Any, Tuple, int]] = [
+            _sender: List[Tuple[str, Any, int, int]] = [
                 (self._from_label, font_section, COLOR_GRAY, 0),
             ]
-            for field, pad in [(self.sender.get('name', ''), 3),
-                               (self.sender.get('street', ''), 0)]:
-                if field:
-                    _sender.append((field, font_sender, COLOR_BLACK, pad))
-            addr_parts = [p for p in [self.sender.get('zip_city'), self.sender.get('country')] if p]
-            if addr_parts:
-                _sender.append((' \u00b7 '.join(addr_parts), font_sender, COLOR_BLACK, 0))
-
-            _recip: List[Tuple[str, Any, Tuple, int]] = [
+            if self._sender_name:
+                _sender.append((self._sender_name, font_sender, COLOR_BLACK, 3))
+            if self._sender_street:
+                _sender.append((self._sender_street, font_sender, COLOR_BLACK, 0))
+            if self._sender_address:
+                _sender.append((self._sender_address, font_sender, COLOR_BLACK, 0))
+
+            _recip: List[Tuple[str, Any, int, int]] = [
                 (self._to_label, font_section, COLOR_GRAY, 0),
             ]
-            for field, font, pad in [
-                (self.recipient.get('company', ''), font_rdetail, 5),
-                (self.recipient.get('name', ''), font_rname, 5),
-                (self.recipient.get('street', ''), font_rdetail, 5),
-                (self.recipient.get('zip_city', ''), font_rdetail, 0),
-                (self.recipient.get('country', ''), font_rdetail, 0),
-            ]:
-                if field:
-                    _recip.append((field, font, COLOR_BLACK, pad))
+            for field, value in self._recipient_lines:
+                _recip.append((value, font_rname if field == 'name' else font_rdetail, COLOR_BLACK,
+                               5 if field in _RECIPIENT_SPACED_FIELDS else 0))
             return _sender, _recip
 
         sender_ls_px = max(0, int(font_sender.size * (self._sender_line_spacing - 100) / 100))
@@ -408,11 +423,8 @@ class ShippingLabel:
         sender_lines, recip_lines = build_lines(font_section, font_sender, font_rname, font_rdetail)
 
         def measure_h(lines_list, ls_px=0):
-            total = 0
-            for text, font, _, extra in lines_list:
-                bb = draw_m.textbbox((0, 0), text or ' ', font=font, anchor='lt')
-                total += extra + (bb[3] - bb[1]) + ls_px
-            return total
+            return (sum(extra + measure(text or ' ', font)[1] for text, font, _, extra in lines_list)
+                    + ls_px * len(lines_list))
 
         sender_h = measure_h(sender_lines, sender_ls_px)
         recip_h = measure_h(recip_lines, recip_ls_px)
@@ -434,10 +446,10 @@ class ShippingLabel:
                     target_w = max(int(usable_width * _bscale), 8)
                     sc = target_w / raw_code.width
                     new_h = max(int(raw_code.height * sc), 1)
-                    code_img = raw_code.resize((target_w, new_h), Image.Resampling.LANCZOS)
+                    code_img = raw_code.resize((target_w, new_h),
+                                               _barcode_resample(raw_code.width, target_w))
                 code_h = code_img.height
-                tb = draw_m.textbbox((0, 0), self.tracking_number, font=font_tracking, anchor='lt')
-                tracking_text_h = tb[3] - tb[1]
+                tracking_text_h = measure(self.tracking_number, font_tracking)[1]
 
         code_row_h = (
             (code_h + (8 + tracking_text_h if self._tracking_barcode_type != 'qr' else 0) + 14)
@@ -458,28 +470,23 @@ class ShippingLabel:
             sender_ls_px = max(0, int(font_sender.size * (self._sender_line_spacing - 100) / 100))
             recip_ls_px = max(0, int(font_rdetail.size * (self._recipient_line_spacing - 100) / 100))
             sender_lines, recip_lines = build_lines(font_section, font_sender, font_rname, font_rdetail)
-            sender_h = measure_h(sender_lines, sender_ls_px)
-            recip_h = measure_h(recip_lines, recip_ls_px)
 
-        img = Image.new('RGB', (canvas_w, canvas_h), 'white')
+        img = Image.new('L', (canvas_w, canvas_h), 255)
         draw = ImageDraw.Draw(img)
         y = mt
 
         def draw_lines(lines_list, ls_px=0):
             nonlocal y
-            for text, font, color, extra_top in lines_list:
-                if not text:
-                    continue
-                y += extra_top
-                draw.text((ml, y), text, fill=color, font=font, anchor='lt')
-                bb = draw.textbbox((ml, y), text, font=font, anchor='lt')
-                y += bb[3] - bb[1] + ls_px
+            placed, block_h = _layout_lines(measure, lines_list, ls_px)
+            for text, font, color, dy in placed:
+                draw.text((ml, y + dy), text, fill=color, font=font, anchor='lt')
+            y += block_h
 
         draw_lines(sender_lines, sender_ls_px)
 
         y += DIVIDER_H
-        _draw_dashed_line(draw, ml, y, canvas_w - mr, y,
-                          fill=(170, 170, 170), width=2, dash_len=10, gap_len=6)
+        _paste_dashed_line(img, ml, y, canvas_w - mr, y,
+                           fill=170, width=2, dash_len=10, gap_len=6)
         y += 1 + DIVIDER_H
 
         recip_y_start = y
@@ -502,15 +509,12 @@ class ShippingLabel:
 
         if code_img:
             y += 14
-            if self._tracking_barcode_type == 'qr':
-                img.paste(code_img, (ml, y))
-                if self._barcode_show_text and tracking_text_h:
-                    tx = ml + code_img.width + 12
-                    ty = y + max((code_img.height - tracking_text_h) // 2, 0)
-                    if tx + 20 <= canvas_w - mr:
-                        draw.text((tx, ty), self.tracking_number,
-                                  fill=COLOR_BLACK, font=font_tracking, anchor='lt')
-            else:
-                img.paste(code_img, (ml, y))
+            img.paste(code_img, (ml, y))
+            if self._tracking_barcode_type == 'qr' and self._barcode_show_text and tracking_text_h:
+                tx = ml + code_img.width + 12
+                ty = y + max((code_img.height - tracking_text_h) // 2, 0)
+                if tx + 20 <= canvas_w - mr:
+                    draw.text((tx, ty), self.tracking_number,
+                              fill=COLOR_BLACK, font=font_tracking, anchor='lt')
 
         return img
@@ -1,13 +1,15 @@
 """SimpleLabel — text / image / barcode / QR label renderer."""
 
+import functools
 import os
-import uuid
-import copy
 import re
 import random
 import string
 import datetime
 import logging
+import math
+import threading
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 from PIL import Image, ImageDraw, ImageFont
@@ -16,10 +18,124 @@ import barcode
 from barcode.writer import ImageWriter
 
 from .enums import LabelContent, LabelOrientation, LabelType
-from .label_utils import FONT_CACHE, WARNING_TEXT_LENGTH, DEFAULT_RANDOM_LENGTH
+from .label_utils import load_font, has_dynamic_lines, MEASURE_DRAW, WARNING_TEXT_LENGTH, DEFAULT_RANDOM_LENGTH
 
 logger = logging.getLogger(__name__)
 
+# Template placeholders, see SimpleLabel.process_templates
+_RE_COUNTER = re.compile(r"\{\{counter(?:\:(\d+))?\}\}")
+_RE_DATETIME = re.compile(r"\{\{datetime:([^}]+)\}\}")
+_RE_ENV = re.compile(r"\{\{env:([^}]+)\}\}")
+_RE_RANDOM = re.compile(r"\{\{random(?:\:(\d+))?(?:\:(s(hift)?))?\}\}")
+# Characters for {{random}} and shifted text; also measured as the full
+# line height of a font
+_RANDOM_CHARS = string.ascii_letters + string.digits + string.punctuation
+
+# Text anchor for each line alignment
+_ANCHORS = {'left': 'lt', 'center': 'mt', 'right': 'rt'}
+
+# LRU of rendered labels, keyed by SimpleLabel._render_key. Reprints of the
+# same label return the stored image; callers only read it.
+RENDER_CACHE_SIZE = 16
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=256)
+def _full_line_extent(font) -> Tuple[int, int]:
+    """Top and bottom of a line holding every character, drawn at y=0."""
+    bbox = MEASURE_DRAW.textbbox((0, 0), _RANDOM_CHARS, font, anchor="lt")
+    return bbox[1], bbox[3]
+
+
+@functools.lru_cache(maxsize=1024)
+def _text_bbox(text: str, font, align: str) -> Tuple[int, int, int, int]:
+    """
+    Bounding box of ``text`` drawn at (0, 0) with anchor "lt". Reprinted
+    labels measure the same lines again; the box only shifts with y.
+    """
+    return MEASURE_DRAW.textbbox((0, 0), text, font=font, align=align, anchor="lt")
+
+
+def _random_uuid() -> str:
+    """
+    Format 128 random bits like ``str(uuid.UUID(int=...))``, without building
+    a UUID object. Uses the module RNG so random.seed() keeps applying.
+    """
+    h = f'{random.getrandbits(128):032x}'
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+
+
+@functools.lru_cache(maxsize=64)
+def _render_barcode(barcode_type: str, value: str):
+    """
+    Render a barcode. Repeated labels with the same code reuse the image;
+    callers only read it (rotate/resize/paste create new images).
+    """
+    return barcode.get_barcode_class(barcode_type)(value, writer=ImageWriter(mode='L')).render()
+
+
+@functools.lru_cache(maxsize=64)
+def _render_qr(text: str, box_size: int, error_correction: int, fill_color: str, ascii_plain: bool = False):
+    """
+    Render a QR code, cached like _render_barcode. With ``ascii_plain``,
+    ASCII payloads are encoded without the UTF-8 byte order mark, which
+    only costs capacity and can push the code up a version.
+    """
+    data = text.encode("utf-8-sig")
+    if ascii_plain and text.isascii():
+        data = text.encode("ascii")
+    qr = QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=0,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color=fill_color, back_color="white")
+
+
+def _rotation_matrix(size: Tuple[int, int], angle: float):
+    """
+    Return the (reverse) affine matrix and the output size that
+    ``Image.rotate(angle, expand=True)`` uses for an image of ``size``,
+    computed the same way Pillow does.
+    """
+    w, h = size
+    rad = -math.radians(angle)
+    a = e = round(math.cos(rad), 15)
+    b = round(math.sin(rad), 15)
+    d = -b
+    cx, cy = w / 2, h / 2
+    c = -a * cx - b * cy + cx
+    f = -d * cx - e * cy + cy
+    xx = [a * x + b * y + c for x, y in ((0, 0), (w, 0), (w, h), (0, h))]
+    yy = [d * x + e * y + f for x, y in ((0, 0), (w, 0), (w, h), (0, h))]
+    nw = math.ceil(max(xx)) - math.floor(min(xx))
+    nh = math.ceil(max(yy)) - math.floor(min(yy))
+    tx, ty = -(nw - w) / 2.0, -(nh - h) / 2.0
+    return (a, b, a * tx + b * ty + c, d, e, d * tx + e * ty + f), (nw, nh)
+
+
+def _rotate_resize(img: Image.Image, angle: float, size: Tuple[int, int]) -> Image.Image:
+    """
+    Rotate ``img`` by ``angle`` (expanding it) and scale the result to
+    ``size`` in a single BICUBIC resample pass. Large downscales are first
+    box-reduced, like ``resize(..., reducing_gap=2.0)`` does.
+    """
+    if size[0] <= 0 or size[1] <= 0:
+        # Same error as Image.resize, so it is reported as a client error
+        raise ValueError("height and width must be > 0")
+    (a, b, c, d, e, f), (rotated_w, rotated_h) = _rotation_matrix(img.size, angle)
+    sx, sy = rotated_w / size[0], rotated_h / size[1]
+    factor = int(min(sx, sy) / 2.0)
+    if factor > 1 and img.mode not in ('1', 'P'):
+        img = img.reduce(factor)
+        a, b, c, d, e, f = (v / factor for v in (a, b, c, d, e, f))
+    return img.transform(size, Image.Transform.AFFINE, (a * sx, b * sy, c, d * sx, e * sy, f),
+                         Image.Resampling.BICUBIC, fillcolor="white")
+
 
 class SimpleLabel:
     """
@@ -58,6 +174,8 @@ class SimpleLabel:
         counter: int = 0,
         red_support: bool = False,
         code_text: str = '',
+        fast_rendering: bool = False,
+        shared_image: bool = False,
     ):
         """Initialize a SimpleLabel object."""
         if width < 0 or height < 0:
@@ -79,6 +197,8 @@ class SimpleLabel:
         self._label_margin = label_margin
         self._fore_color = fore_color
         self.text = None
+        self._line_styles = None
+        self._has_text = False
         self.input_text = text
         self._qr_size = qr_size
         self.qr_correction = qr_correction
@@ -94,6 +214,11 @@ class SimpleLabel:
         self._timestamp = timestamp
         self._red_support = red_support
         self._code_text = code_text
+        # Trade exact output for speed when scaling images (see config)
+        self._fast_rendering = fast_rendering
+        # The image is a cached object reused by later requests (repository
+        # images); renders from one-off uploads are never worth caching
+        self._shared_image = shared_image
 
     @property
     def label_content(self):
@@ -109,10 +234,8 @@ class SimpleLabel:
             return True
         if self._label_content in (LabelContent.QRCODE_ONLY,):
             return False
-        logger.debug(f"Text content: {self.text}")
-        if self.text and any(line.get('text', '').strip() != '' for line in self.text):
-            return True
-        return False
+        logger.debug('Text content: %s', self.text)
+        return self._has_text
 
     @property
     def need_image_text_distance(self):
@@ -159,50 +282,101 @@ class SimpleLabel:
 
     def process_templates(self) -> None:
         """Process and replace templates in the text lines."""
-        self.text = copy.deepcopy(self.input_text)
+        # Lines only hold scalars and only their own keys are rewritten, so
+        # copying each dict keeps the (shared) input untouched
+        self.text = [dict(line) for line in self.input_text]
+        self._line_styles = None
         for line in self.text:
             text_val = line.get('text', '')
             if len(text_val) > WARNING_TEXT_LENGTH:
                 logger.warning(
                     f"Text line is very long (> {WARNING_TEXT_LENGTH} characters), "
                     "this may lead to long processing times.")
+            if "{{" not in text_val:
+                line['text'] = text_val
+                continue
 
             def counter_replacer(match):
                 offset = int(match.group(1)) if match.group(1) else 1
                 return str(self._counter + offset)
-            text_val = re.sub(r"\{\{counter(?:\:(\d+))?\}\}", counter_replacer, text_val)
+            text_val = _RE_COUNTER.sub(counter_replacer, text_val)
 
             def datetime_replacer(match):
                 fmt = match.group(1)
                 now = datetime.datetime.fromtimestamp(self._timestamp) if self._timestamp > 0 else datetime.datetime.now()
                 return now.strftime(fmt)
-            text_val = re.sub(r"\{\{datetime:([^}]+)\}\}", datetime_replacer, text_val)
+            text_val = _RE_DATETIME.sub(datetime_replacer, text_val)
 
             if "{{uuid}}" in text_val:
-                ui = uuid.UUID(int=random.getrandbits(128))
-                text_val = text_val.replace("{{uuid}}", str(ui))
+                text_val = text_val.replace("{{uuid}}", _random_uuid())
 
             if "{{short-uuid}}" in text_val:
-                ui = uuid.UUID(int=random.getrandbits(128))
-                text_val = text_val.replace("{{short-uuid}}", str(ui)[:8])
+                text_val = text_val.replace("{{short-uuid}}", _random_uuid()[:8])
 
             def env_replacer(match):
                 var_name = match.group(1)
                 return os.getenv(var_name, "")
-            text_val = re.sub(r"\{\{env:([^}]+)\}\}", env_replacer, text_val)
+            text_val = _RE_ENV.sub(env_replacer, text_val)
 
             def random_replacer(match):
                 length = int(match.group(1)) if match.group(1) else DEFAULT_RANDOM_LENGTH
                 if match.group(2):
                     line['shift'] = True
-                return ''.join(random.choices(string.ascii_letters + string.digits + string.punctuation, k=length))
-            text_val = re.sub(r"\{\{random(?:\:(\d+))?(?:\:(s(hift)?))?\}\}", random_replacer, text_val)
+                return ''.join(random.choices(_RANDOM_CHARS, k=length))
+            text_val = _RE_RANDOM.sub(random_replacer, text_val)
 
             line['text'] = text_val
 
-    def generate(self, rotate: bool = False):
+        self._has_text = any(line['text'].strip() != '' for line in self.text)
+
+    def generate(self, rotate: bool = False, preview: bool = False):
         self.process_templates()
 
+        key = self._render_key(rotate, preview)
+        if key is not None:
+            with _render_cache_lock:
+                cached = _render_cache.get(key)
+                # The key holds the input image's id(); only trust it for
+                # the very image object the entry was rendered from
+                if cached is not None and cached[0] is self._image:
+                    _render_cache.move_to_end(key)
+                    return cached[1]
+        imgResult = self._render(rotate, preview)
+        if key is not None:
+            with _render_cache_lock:
+                _render_cache[key] = (self._image, imgResult)
+                while len(_render_cache) > RENDER_CACHE_SIZE:
+                    _render_cache.popitem(last=False)
+        return imgResult
+
+    def _render_key(self, rotate: bool, preview: bool) -> Optional[tuple]:
+        """
+        Return a key for everything the rendered label depends on, or None
+        if it cannot be cached: templated or shifted text differs on every
+        render, and each upload is a new image object, so such entries could
+        never be hit and would only push reusable ones out.
+        """
+        if has_dynamic_lines(self.input_text or []):
+            return None
+        if self._image is not None and not self._shared_image:
+            return None
+        key = (
+            self._width, self._height, self._label_content, self._label_orientation, self._label_type,
+            self.barcode_type, tuple(self._label_margin), tuple(self._fore_color),
+            tuple(tuple(sorted(line.items())) for line in self.text),
+            self._qr_size, self._qr_correction, self._code_text,
+            None if self._image is None else id(self._image),
+            self._image_fit, self._image_scaling_factor, self._image_rotation,
+            self._border_thickness, self._border_roundness, tuple(self._border_distance), tuple(self._border_color),
+            self._fast_rendering, rotate, preview,
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _render(self, rotate: bool, preview: bool) -> Image.Image:
         if self._label_content in (LabelContent.QRCODE_ONLY, LabelContent.TEXT_QRCODE):
             if self.barcode_type == "QR":
                 img = self._generate_qr()
@@ -217,14 +391,22 @@ class SimpleLabel:
         margin_left, margin_right, margin_top, margin_bottom = self._label_margin
 
         if img is not None:
+            # Free rotations are folded into the resize pass when rendering fast
+            fused_rotation = None
             if self._image_rotation != 0 and self._image_rotation != 360:
-                img = img.rotate(-self._image_rotation, expand=True, fillcolor="white")
+                if self._fast_rendering and self._image_rotation % 90:
+                    fused_rotation = -self._image_rotation
+                else:
+                    img = img.rotate(-self._image_rotation, expand=True, fillcolor="white")
+            if fused_rotation is None:
+                img_width, img_height = img.size
+            else:
+                img_width, img_height = _rotation_matrix(img.size, fused_rotation)[1]
             if self._image_fit:
                 max_width = max(width - margin_left - margin_right, 1)
                 max_height = max(height - margin_top - margin_bottom, 1)
-                img_width, img_height = img.size
-                logger.debug(f"Maximal allowed dimensions: {max_width}x{max_height} mm")
-                logger.debug(f"Original image size: {img_width}x{img_height} px")
+                logger.debug('Maximal allowed dimensions: %sx%s mm', max_width, max_height)
+                logger.debug('Original image size: %sx%s px', img_width, img_height)
                 scale = 1.0
                 if self._label_orientation == LabelOrientation.STANDARD:
                     if self._label_type in (LabelType.ENDLESS_LABEL,):
@@ -236,23 +418,23 @@ class SimpleLabel:
                         scale = max_height / img_height
                     else:
                         scale = min(max_width / img_width, max_height / img_height)
-                logger.debug(f"Scaling image by factor: {scale}")
+                logger.debug('Scaling image by factor: %s', scale)
                 new_size = (int(img_width * scale), int(img_height * scale))
-                logger.debug(f"Resized image size: {new_size} px")
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
+                logger.debug('Resized image size: %s px', new_size)
+                img = self._scale_image(img, new_size, fused_rotation, preview)
                 img_width, img_height = img.size
             else:
-                img_width, img_height = img.size
                 scale = self._image_scaling_factor / 100.0
-                logger.debug(f"Manual image scaling factor: {scale}")
+                logger.debug('Manual image scaling factor: %s', scale)
                 new_size = (int(img_width * scale), int(img_height * scale))
-                logger.debug(f"Resized image size: {new_size} px")
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
+                logger.debug('Resized image size: %s px', new_size)
+                img = self._scale_image(img, new_size, fused_rotation, preview)
                 img_width, img_height = img.size
         else:
             img_width, img_height = (0, 0)
 
-        if self.want_text(img):
+        with_text = self.want_text(img)
+        if with_text:
             bboxes = self._draw_text(None, [])
             textsize = self._compute_bbox(bboxes)
         else:
@@ -300,13 +482,13 @@ class SimpleLabel:
         width = max(int(width), 1)
         height = max(int(height), 1)
 
-        logger.debug(f"Image resolution: {int(width)} x {int(height)} px")
-        imgResult = Image.new('RGB', (int(width), int(height)), 'white')
+        logger.debug('Image resolution: %d x %d px', width, height)
+        imgResult = Image.new(self._canvas_mode(img, with_text), (int(width), int(height)), 'white')
 
         if img is not None:
             imgResult.paste(img, image_offset)
 
-        if self.want_text(img):
+        if with_text:
             self._draw_text(imgResult, bboxes, text_offset)
 
         preview_needs_rotation = (
@@ -314,7 +496,7 @@ class SimpleLabel:
             self._label_orientation == LabelOrientation.STANDARD and self._label_type in (LabelType.DIE_CUT_LABEL, LabelType.ROUND_DIE_CUT_LABEL)
         )
         if rotate and preview_needs_rotation:
-            imgResult = imgResult.rotate(-90, expand=True)
+            imgResult = imgResult.transpose(Image.Transpose.ROTATE_270)
 
         if self._border_thickness > 0:
             draw = ImageDraw.Draw(imgResult)
@@ -324,34 +506,74 @@ class SimpleLabel:
                     imgResult.height - self._border_distance[1] - 1]
             if rect[2] < rect[0] or rect[3] < rect[1]:
                 raise ValueError("Invalid border rectangle")
-            draw.rounded_rectangle(rect, radius=self._border_roundness, outline=self._border_color, width=self._border_thickness)
+            outline = self._border_color if imgResult.mode == 'RGB' else self._border_color[0]
+            draw.rounded_rectangle(rect, radius=self._border_roundness, outline=outline, width=self._border_thickness)
+        if preview and imgResult.mode != 'RGB':
+            imgResult = imgResult.convert('RGB')
         return imgResult
 
+    def _canvas_mode(self, img: Optional[Image.Image], with_text: bool) -> str:
+        """
+        Return 'L' when everything on the label is black, white or gray,
+        else 'RGB'. The printer converts black-only labels to grayscale
+        anyway, so compositing them in one channel saves two thirds of the
+        memory traffic.
+        """
+        if img is not None and img.mode not in ('1', 'L'):
+            return 'RGB'
+        if self._border_thickness > 0 and self._border_color != (0, 0, 0):
+            return 'RGB'
+        if with_text and any(style[5] != 'black' for style in self._line_styles):
+            return 'RGB'
+        return 'L'
+
+    def _scale_image(self, img: Image.Image, size: Tuple[int, int], rotation: Optional[float] = None,
+                     preview: bool = False) -> Image.Image:
+        """
+        Resize ``img`` to ``size``, rotating it first by ``rotation`` degrees if given.
+        Fast rendering box-reduces large images before resampling (reducing_gap),
+        and fast previews use the cheaper BILINEAR filter; prints keep LANCZOS.
+        """
+        if rotation is not None:
+            return _rotate_resize(img, rotation, size)
+        if not self._fast_rendering:
+            return img.resize(size, Image.Resampling.LANCZOS)
+        if preview:
+            return img.resize(size, Image.Resampling.BILINEAR, reducing_gap=3.0)
+        return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
     def _generate_barcode(self):
-        barcode_generator = barcode.get_barcode_class(self.barcode_type)
         if len(self._code_text) > 0:
             value = self._code_text
         else:
             value = self.text[0].get('text', '') if self.text and self.text[0].get('text', '') else ''
-        my_barcode = barcode_generator(value, writer=ImageWriter())
-        return my_barcode.render()
+        return _render_barcode(self.barcode_type, value)
 
     def _generate_qr(self):
-        qr = QRCode(
-            version=1,
-            error_correction=self._qr_correction,
-            box_size=self._qr_size,
-            border=0,
-        )
         if len(self._code_text) > 0:
             text = self._code_text
         else:
             text = "\n".join(line.get('text', '') for line in self.text)
-        qr.add_data(text.encode("utf-8-sig"))
-        qr.make(fit=True)
         fill_color = 'red' if self._fore_color == (255, 0, 0) else 'black'
-        qr_img = qr.make_image(fill_color=fill_color, back_color="white")
-        return qr_img
+        return _render_qr(text, self._qr_size, self._qr_correction, fill_color, self._fast_rendering)
+
+    def _get_line_styles(self) -> List[Tuple]:
+        """
+        Resolve the per-line drawing parameters once for both passes of
+        _draw_text: (font, size, align, anchor, spacing, color, inverted, checkbox).
+        """
+        styles = []
+        for line in self.text:
+            size = int(line['size'])
+            spacing = int(size * ((int(line['line_spacing']) - 100) / 100)) if 'line_spacing' in line else 0
+            align = line.get('align', 'center')
+            anchor = _ANCHORS.get(align)
+            if anchor is None:
+                raise ValueError(f"Unsupported alignment: {align}")
+            color = 'red' if line.get('color') == 'red' else 'black'
+            styles.append((self._get_font(line['path'], size), size, align, anchor, spacing, color,
+                           'inverted' in line and line['inverted'], line.get('checkbox', False)))
+        return styles
 
     def _draw_text(self, img=None, bboxes=[], text_offset=(0, 0)):
         """
@@ -359,88 +581,71 @@ class SimpleLabel:
         When img is None, performs a dry-run to calculate bounding boxes only.
         """
         do_draw = img is not None
-        if not do_draw:
-            img = Image.new('L', (20, 20), 'white')
-        draw = ImageDraw.Draw(img)
+        draw = ImageDraw.Draw(img) if do_draw else MEASURE_DRAW
         y = 0
+        # Horizontal extent of the whole text block, from the dry-run
+        if bboxes:
+            block_min_x = min(bbox[0][0] for bbox in bboxes)
+            block_max_x = max(bbox[0][2] for bbox in bboxes)
+        else:
+            block_min_x = block_max_x = 0
 
-        for i, line in enumerate(self.text):
-            spacing = int(int(line['size'])*((int(line['line_spacing']) - 100) / 100)) if 'line_spacing' in line else 0
-            font = self._get_font(line['path'], line['size'])
-            anchor = None
-            align = line.get('align', 'center')
-
-            if align == "left":
-                anchor = "lt"
-            elif align == "center":
-                anchor = "mt"
-            elif align == "right":
-                anchor = "rt"
-            else:
-                raise ValueError(f"Unsupported alignment: {align}")
-
-            red_font = 'color' in line and line['color'] == 'red'
-            color = (255, 0, 0) if red_font else (0, 0, 0)
-            checkbox = line.get('checkbox', False)
+        if self._line_styles is None:
+            self._line_styles = self._get_line_styles()
 
-            INVERT_LINE = 'inverted' in line and line['inverted']
+        for i, line in enumerate(self.text):
+            font, size, align, anchor, spacing, color, INVERT_LINE, checkbox = self._line_styles[i]
             if do_draw and INVERT_LINE:
                 center_x = 0
                 if anchor == "lt":
-                    min_bbox_x = text_offset[0] + min(bbox[0][0] for bbox in bboxes)
+                    min_bbox_x = text_offset[0] + block_min_x
                     max_bbox_x = text_offset[0] + bboxes[i][0][2]
                 elif anchor == "mt":
-                    min_bbox_x = min(bbox[0][0] for bbox in bboxes)
-                    max_bbox_x = max(bbox[0][2] for bbox in bboxes)
-                    center_x = (min_bbox_x + max_bbox_x) // 2
+                    center_x = (block_min_x + block_max_x) // 2
                     min_bbox_x = text_offset[0] + center_x - (bboxes[i][0][2] - bboxes[i][0][0]) // 2
                     max_bbox_x = text_offset[0] + center_x + (bboxes[i][0][2] - bboxes[i][0][0]) // 2
                 elif anchor == "rt":
-                    max_bbox_x = text_offset[0] + max(bbox[0][2] for bbox in bboxes)
+                    max_bbox_x = text_offset[0] + block_max_x
                     min_bbox_x = max_bbox_x - (bboxes[i][0][2] - bboxes[i][0][0])
-                shift = 0.1 * int(line['size'])
+                shift = 0.1 * size
                 y_min = bboxes[i][0][1] + text_offset[1] - shift
                 y_max = bboxes[i][0][3] + text_offset[1] - shift
                 draw.rectangle((min_bbox_x, y_min, max_bbox_x, y_max), fill=color)
-                color = (255, 255, 255)
+                color = 'white'
 
             if not do_draw:
-                bbox = draw.textbbox((0, y), line['text'], font=font, align=align, anchor="lt")
+                left, top, right, bottom = _text_bbox(line['text'], font, align)
+                bbox = (left, y + top, right, y + bottom)
                 IS_LAST_LINE = i == len(self.text) - 1
                 if not IS_LAST_LINE or INVERT_LINE:
-                    all_characters = ''.join(string.ascii_letters + string.digits + string.punctuation)
-                    Ag = draw.textbbox((0, y), all_characters, font, anchor="lt")
-                    bbox = (bbox[0], Ag[1], bbox[2], Ag[3])
+                    top, bottom = _full_line_extent(font)
+                    bbox = (bbox[0], y + top, bbox[2], y + bottom)
                 bboxes.append((bbox, y))
                 y += bbox[3] - bbox[1] + (spacing if i < len(self.text)-1 else 0)
             else:
                 bbox = bboxes[i][0]
                 y = bboxes[i][1] + text_offset[1]
                 if align == "left":
-                    min_bbox_x = min(bbox[0][0] for bbox in bboxes) if len(bboxes) > 0 else 0
-                    x = min_bbox_x + text_offset[0]
+                    x = block_min_x + text_offset[0]
                 elif align == "center":
-                    min_bbox_x = min(bbox[0][0] for bbox in bboxes) if len(bboxes) > 0 else 0
-                    max_bbox_x = max(bbox[0][2] for bbox in bboxes) if len(bboxes) > 0 else 0
-                    x = (max_bbox_x - min_bbox_x) // 2 + min_bbox_x + text_offset[0]
+                    x = (block_max_x - block_min_x) // 2 + block_min_x + text_offset[0]
                 elif align == "right":
-                    max_bbox_x = max(bbox[0][2] for bbox in bboxes) if len(bboxes) > 0 else 0
-                    x = max_bbox_x + text_offset[0]
+                    x = block_max_x + text_offset[0]
 
                 if checkbox:
-                    checkbox_box_dimensions = 8 * int(line['size']) // 10
+                    checkbox_box_dimensions = 8 * size // 10
                     bbox = draw.textbbox((x - 1.2 * checkbox_box_dimensions, y), line['text'], font=font, align=align, anchor=anchor)
                     box_dimensions = bbox[0], y, bbox[0] + checkbox_box_dimensions, y + checkbox_box_dimensions
-                    draw.rounded_rectangle(box_dimensions, radius=5, outline=color, width=max(1, checkbox_box_dimensions//10), fill=(255, 255, 255))
+                    draw.rounded_rectangle(box_dimensions, radius=5, outline=color, width=max(1, checkbox_box_dimensions//10), fill='white')
 
                 draw.text((x, y), line['text'], color, font=font, anchor=anchor, align=align, spacing=spacing)
 
                 if "shift" in line:
                     def get_shift_amount():
-                        return 0.03 * random.randint(5, 10) * int(line['size'])
+                        return 0.03 * random.randint(5, 10) * size
                     for x_shift in [-get_shift_amount(), get_shift_amount()]:
                         for y_shift in [-get_shift_amount(), get_shift_amount()]:
-                            new_random_text = ''.join(random.choices(string.ascii_letters + string.digits + string.punctuation, k=len(line['text'])))
+                            new_random_text = ''.join(random.choices(_RANDOM_CHARS, k=len(line['text'])))
                             draw.text((x + x_shift, y + y_shift), new_random_text, color, font=font, anchor=anchor, align=align, spacing=spacing)
 
         return bboxes
@@ -448,18 +653,17 @@ class SimpleLabel:
     def _compute_bbox(self, bboxes):
         if not bboxes:
             return (0, 0, 0, 0)
-        max_width = max(bbox[0][2] for bbox in bboxes)
+        max_width = bboxes[0][0][2]
+        for bbox in bboxes:
+            right = bbox[0][2]
+            if right > max_width:
+                max_width = right
         return (bboxes[0][0][0], bboxes[0][0][1], max_width, bboxes[-1][0][3])
 
     def _get_font(self, font_path: str, size: int) -> ImageFont.FreeTypeFont:
         """Get a font object, using cache for performance."""
-        key = (font_path, size)
-        if key in FONT_CACHE:
-            return FONT_CACHE[key]
         try:
-            font = ImageFont.truetype(font_path, int(size))
-            FONT_CACHE[key] = font
-            return font
+            return load_font(font_path, int(size))
         except Exception as e:
             logger.error(f"Failed to load font '{font_path}' with size {size}: {e}")
             return ImageFont.load_default()
@@ -5,6 +5,9 @@ from app.labeldesigner.printer import reset_printer_cache
 
 bp = Blueprint("printer_power", __name__)
 
+# Keeps the connection to Home Assistant alive between status polls
+_session = requests.Session()
+
 
 @bp.route("/api/printer_power/status", methods=["GET"])
 def printer_power_status():
@@ -17,7 +20,7 @@ def printer_power_status():
     }
     url = f"{cfg.api_url}/states/{cfg.entity_id}"
     try:
-        resp = requests.get(url, headers=headers, timeout=5)
+        resp = _session.get(url, headers=headers, timeout=5)
         resp.raise_for_status()
         state = resp.json().get("state")
         return jsonify({"state": state})
@@ -38,7 +41,7 @@ def printer_power_toggle():
     url = f"{cfg.api_url}/services/switch/toggle"
     data = {"entity_id": cfg.entity_id}
     try:
-        resp = requests.post(url, headers=headers, json=data, timeout=5)
+        resp = _session.post(url, headers=headers, json=data, timeout=5)
         resp.raise_for_status()
         reset_printer_cache()
         return jsonify({"result": "success"})
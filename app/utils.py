@@ -1,57 +1,97 @@
 # -*- coding: utf-8 -*-
 
+import math
+import sys
+from functools import lru_cache
 from PIL import Image
 from io import BufferedReader, BytesIO
 from PIL.ImageOps import colorize
 from flask import current_app
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
 from werkzeug.datastructures import FileStorage
 from app import FONTS, init_fonts
 
 
+def _as_grayscale(image: Image.Image) -> Image.Image:
+    # convert() copies the whole raster even when the mode already matches
+    return image if image.mode == 'L' else image.convert('L')
+
+
+@lru_cache(maxsize=256)
+def _threshold_table(threshold: int) -> tuple:
+    # Lookup table for Image.point(); avoids calling a Python function for
+    # each of the 256 gray levels on every conversion
+    return tuple(255 if pixel > threshold else 0 for pixel in range(256))
+
+
 def convert_image_to_bw(image: Image.Image, threshold: int) -> Image.Image:
-    def apply_threshold(pixel: int) -> int:
-        return 255 if pixel > threshold else 0
+    if image.mode == '1' and 0 <= threshold < 255:
+        # Pixels are already 0 or 255, so thresholding would not change them
+        return image
     # convert to black and white
-    return image.convert('L').point(apply_threshold, mode='1')
+    return _as_grayscale(image).point(_threshold_table(threshold), mode='1')
 
 
 def convert_image_to_grayscale(image: Image.Image) -> Image.Image:
     # convert to grayscale (ITU-R 601-2 Luma transform)
-    return image.convert('L')
+    return _as_grayscale(image)
 
 
 def convert_image_to_red_and_black(image: Image.Image,
                                    blackpoint: int = 0,
                                    whitepoint: int = 255,
                                    redpoint: int = 127) -> Image.Image:
-    return colorize(image.convert('L'), black='black', white='white', mid='red',
+    return colorize(_as_grayscale(image), black='black', white='white', mid='red',
                     blackpoint=blackpoint, whitepoint=whitepoint, midpoint=redpoint)
 
 
 def imgfile_to_image(file: FileStorage | BufferedReader) -> Image.Image:
-    s = BytesIO()
     if isinstance(file, BufferedReader):
-        s.write(file.read())
-    else:
-        file.save(s)
-    im = Image.open(s)
-    return im
+        # Read it all: the caller closes the file before the image is loaded
+        return Image.open(BytesIO(file.read()))
+    # Uploads stay open for the whole request; decode from the spooled
+    # stream instead of copying it into memory first
+    return Image.open(file.stream)
 
 
-def pdffile_to_image(file: FileStorage, dpi: int) -> Image.Image:
+def pdffile_to_image(file: FileStorage, dpi: int, min_size: int = 0,
+                     grayscale: bool = False) -> Image.Image:
+    """
+    Rasterize the first page of a PDF, as an 'L' image with ``grayscale``.
+    With ``min_size``, ``dpi`` is lowered as far as the shorter page side
+    still spans ``min_size`` pixels.
+    """
     s = BytesIO()
     file.save(s)
-    s.seek(0)
-    im = convert_from_bytes(s.read(), dpi=dpi)[0]
+    data = s.getvalue()
+    if min_size > 0:
+        dpi = min(dpi, _pdf_dpi_for_size(data, min_size))
+    # Only the first page is used; don't let poppler render the others
+    im = convert_from_bytes(data, dpi=dpi, first_page=1, last_page=1, grayscale=grayscale)[0]
     return im
 
 
-def image_to_png_bytes(im: Image.Image) -> bytes:
+def _pdf_dpi_for_size(data: bytes, min_size: int) -> int:
+    try:
+        info = pdfinfo_from_bytes(data, first_page=1, last_page=1)
+        # e.g. '595.276 x 841.89 pts (A4)'
+        width, _, height = info['Page size'].split()[:3]
+        short_side = min(float(width), float(height))
+    except Exception:
+        return sys.maxsize
+    if short_side <= 0:
+        return sys.maxsize
+    # PDF sizes are in points, 72 per inch
+    return math.ceil(min_size * 72 / short_side)
+
+
+def image_to_png_bytes(im: Image.Image, compress_level: int = 1) -> bytes:
     image_buffer = BytesIO()
-    im.save(image_buffer, format="PNG")
-    image_buffer.seek(0)
-    return image_buffer.read()
+    # Low deflate levels encode several times faster than PIL's default (6)
+    # for a slightly larger file, which is the right trade-off for previews.
+    im.save(image_buffer, format="PNG", compress_level=compress_level)
+    # getvalue() hands over the buffer without the copy seek()+read() makes
+    return image_buffer.getvalue()
 
 
 def fill_first_line_fields(text, data: dict):
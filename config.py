@@ -30,6 +30,13 @@ class Config(object):
 
     IMAGE_DEFAULT_MODE = "grayscale"
     IMAGE_DEFAULT_BW_THRESHOLD = 70
+    # Trade exact, pixel-identical output for faster rendering
+    IMAGE_FAST_RENDERING = False
+    # Number of freed image memory blocks Pillow keeps for reuse, so each
+    # new label canvas does not go back to the system allocator. This is a
+    # process-wide Pillow setting, applied once by the first app created;
+    # the PILLOW_BLOCKS_MAX environment variable takes precedence.
+    IMAGE_BLOCK_CACHE = 4
 
     LABEL_DEFAULT_MARGIN_TOP = 24
     LABEL_DEFAULT_MARGIN_BOTTOM = 24
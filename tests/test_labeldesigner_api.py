@@ -6,6 +6,7 @@ import random
 import pytest
 import unicodedata
 from typing import Union
+from PIL import Image
 from datetime import datetime
 from flask.testing import FlaskClient
 from werkzeug.datastructures import FileStorage
@@ -22,17 +23,25 @@ EXAMPLE_FORMDATA = {
 }
 
 
+def _decode_png(data: bytes):
+    # Compare decoded pixels rather than PNG bytes so that encoder settings
+    # (e.g. the deflate level) do not invalidate the reference images
+    with Image.open(io.BytesIO(data)) as im:
+        return im.mode, im.size, im.tobytes()
+
+
 def verify_image(response_data: bytes, expected_image_path: str):
     # Compare generated preview with the image in file (if it exists)
     if not UPDATE_IMAGES and os.path.isfile('tests/images/' + expected_image_path):
         with open('tests/images/' + expected_image_path, 'rb') as f:
             expected_data = f.read()
-        if response_data != expected_data:
+        if _decode_png(response_data) != _decode_png(expected_data):
             # Save image for debugging purposes
             failed_image_path = 'tests/' + 'FAILED_' + expected_image_path
             with open(failed_image_path, 'wb') as f:
                 f.write(response_data)
             raise AssertionError("Generated image does not match expected image")
+        return
 
     # Write image into file
     with open('tests/images/' + expected_image_path, 'wb') as f:
@@ -690,6 +699,106 @@ class TestLabelDesignerAPI:
         # Check image
         verify_image(response.data, 'minimal_label.png')
 
+    def test_preview_compress_level(self, client: FlaskClient):
+        data = EXAMPLE_FORMDATA.copy()
+        data['text'] = json.dumps([
+            {'font': 'DejaVu Sans,Book', 'text': 'Compression', 'size': '40', 'align': 'center'}
+        ])
+        fast = client.post('/labeldesigner/api/preview', data=data)
+        data['compress_level'] = '9'
+        small = client.post('/labeldesigner/api/preview', data=data)
+        assert fast.status_code == 200
+        assert small.status_code == 200
+        # Same pixels, only the deflate level differs
+        assert _decode_png(fast.data) == _decode_png(small.data)
+        assert len(small.data) <= len(fast.data)
+
+    def test_preview_cache(self, client: FlaskClient, monkeypatch):
+        import app.labeldesigner.routes as routes
+        renders = []
+        create_label = routes.create_label_from_request
+
+        def counting_create_label(*args, **kwargs):
+            renders.append(args)
+            return create_label(*args, **kwargs)
+        monkeypatch.setattr(routes, 'create_label_from_request', counting_create_label)
+
+        data = EXAMPLE_FORMDATA.copy()
+        data['text'] = json.dumps([
+            {'font': 'DejaVu Sans,Book', 'text': 'Cached preview', 'size': '40', 'align': 'center'}
+        ])
+        first = client.post('/labeldesigner/api/preview', data=data)
+        assert first.status_code == 200
+
+        # An identical request must be answered without rendering again
+        second = client.post('/labeldesigner/api/preview', data=data)
+        assert second.status_code == 200
+        assert second.data == first.data
+        assert len(renders) == 1
+
+        # Templates and shifted text change on every render and must bypass the cache
+        for line in ({'text': '{{counter}}'}, {'text': 'Shifted', 'shift': True}):
+            data['text'] = json.dumps([
+                dict(line, font='DejaVu Sans,Book', size='40', align='center')
+            ])
+            del renders[:]
+            for _ in range(2):
+                response = client.post('/labeldesigner/api/preview', data=data)
+                assert response.status_code == 200
+            assert len(renders) == 2
+
+        # Settings changed after the app was created must reach the key
+        data['text'] = json.dumps([
+            {'font': 'DejaVu Sans,Book', 'text': 'Cached preview', 'size': '40', 'align': 'center'}
+        ])
+        del renders[:]
+        client.application.config['IMAGE_FAST_RENDERING'] = True
+        response = client.post('/labeldesigner/api/preview', data=data)
+        assert response.status_code == 200
+        assert len(renders) == 1
+
+    def test_reprint_render_cache(self, client: FlaskClient, monkeypatch):
+        from app.labeldesigner.simple_label import SimpleLabel
+        from app.labeldesigner.services import create_label_from_request
+        renders = []
+        render = SimpleLabel._render
+
+        def counting_render(self, *args, **kwargs):
+            renders.append(self)
+            return render(self, *args, **kwargs)
+        monkeypatch.setattr(SimpleLabel, '_render', counting_render)
+
+        data = {k: str(v) for k, v in EXAMPLE_FORMDATA.items()}
+        data['text'] = json.dumps([
+            {'font': 'DejaVu Sans,Book', 'text': 'Reprinted label', 'size': '40', 'align': 'center'}
+        ])
+        # Rendering the same label again must reuse the rendered image
+        first = create_label_from_request(data).generate()
+        second = create_label_from_request(data).generate()
+        assert len(renders) == 1
+        assert second.tobytes() == first.tobytes()
+
+        # Templates change on every render and are rendered each time
+        data['text'] = json.dumps([
+            {'font': 'DejaVu Sans,Book', 'text': 'Copy {{counter}}', 'size': '40', 'align': 'center'}
+        ])
+        create_label_from_request(data).generate()
+        create_label_from_request(data).generate()
+        assert len(renders) == 3
+
+        # Every upload is decoded anew; caching its renders would only pin
+        # the decoded source image
+        from app.labeldesigner import simple_label
+        data['text'] = '[]'
+        data['print_type'] = 'image'
+        for _ in range(2):
+            with open('tests/fixtures/_demo_image_simple.png', 'rb') as f:
+                upload = FileStorage(stream=f, filename='_demo_image_simple.png', content_type='image/png')
+                label = create_label_from_request(data, {'image': upload})
+            label.generate()
+            assert all(entry[0] is not label._image for entry in simple_label._render_cache.values())
+        assert len(renders) == 5
+
     def test_unicode_and_special_characters(self, client: FlaskClient):
         data = EXAMPLE_FORMDATA.copy()
         data['text'] = json.dumps([
@@ -1015,6 +1124,27 @@ class TestLabelDesignerAPI:
             data = response.get_json()
             assert data['message'] == 'Image scaling factor must be > 0.'
 
+    def test_image_rotation_subpixel_scaling_fast(self, client: FlaskClient):
+        # A rotated image scaled below one pixel must be rejected, not crash
+        client.application.config['IMAGE_FAST_RENDERING'] = True
+        data = EXAMPLE_FORMDATA.copy()
+        image_path = "tests/fixtures/_demo_image_simple.png"
+        my_file = FileStorage(
+            stream=open(image_path, "rb"),
+            filename=os.path.basename(image_path),
+            content_type="image/png",
+        )
+        data['print_type'] = 'image'
+        data['image'] = my_file
+        data['image_mode'] = 'grayscale'
+        data['image_fit'] = '0'
+        data['image_scaling_factor'] = '0.01'
+        data['image_rotation'] = '45'
+        response = client.post('/labeldesigner/api/preview', data=data)
+        assert response.status_code == 400
+        assert response.is_json
+        assert response.get_json()['message'] == 'height and width must be > 0'
+
     @pytest.mark.parametrize('rotation', [-10, -1, 0, 1, 10, 45, 90, 180, 270, 360, 450])
     def test_image_rotation(self, client: FlaskClient, rotation):
         data = EXAMPLE_FORMDATA.copy()
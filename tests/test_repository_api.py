@@ -71,6 +71,10 @@ def test_repository_save_list_load_delete_and_preview(tmp_path, label: str):
     # Verify image preview
     verify_image(decoded, f'repo_test_{label}.png')
 
+    # An unchanged preview is revalidated without sending it again
+    resp = client.get(preview_url, headers={'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+
     # Load the stored JSON
     resp = client.get(f'/labeldesigner/api/repository/load?name=repo_test_{label}.json')
     assert resp.status_code == 200
@@ -225,3 +229,87 @@ def test_save_image_restore_other_and_print(tmp_path):
     assert resp.is_json
     data = resp.get_json()
     assert data.get('success') is True
+
+
+@pytest.mark.parametrize('relative_repo', [False, True])
+def test_repository_load_raw_image(tmp_path, monkeypatch, relative_repo: bool):
+    client = make_client(tmp_path)
+    if relative_repo:
+        # A relative repository directory is resolved against the working directory
+        monkeypatch.chdir(tmp_path)
+        client.application.config['LABEL_REPOSITORY_DIR'] = 'labels_rel'
+
+    demo_img_path = os.path.join(os.path.dirname(__file__), '../labels/Kopie-vorab_image.png')
+    with open(demo_img_path, 'rb') as imgfh:
+        img_b = imgfh.read()
+    resp = client.post('/labeldesigner/api/repository/save', json={
+        'name': 'repo_raw.json',
+        'image_data': base64.b64encode(img_b).decode('ascii'),
+        'image_mime': 'image/png',
+    })
+    assert resp.status_code == 200
+
+    # The stored image is returned unchanged, and revalidation gets a 304
+    resp = client.get('/labeldesigner/api/repository/load?name=repo_raw.json&format=raw')
+    assert resp.status_code == 200
+    assert resp.content_type == 'image/png'
+    assert resp.data == img_b
+    resp = client.get('/labeldesigner/api/repository/load?name=repo_raw.json&format=raw',
+                      headers={'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+
+    # Labels without an image have nothing to send
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_plain.json'})
+    assert resp.status_code == 200
+    resp = client.get('/labeldesigner/api/repository/load?name=repo_plain.json&format=raw')
+    assert resp.status_code == 404
+
+
+def test_repository_list_reflects_changes(tmp_path):
+    client = make_client(tmp_path)
+
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_list.json', 'label_size': '62'})
+    assert resp.status_code == 200
+    files = client.get('/labeldesigner/api/repository/list').get_json()['files']
+    assert [(f['name'], f['label_size']) for f in files] == [('repo_list.json', '62mm endless')]
+
+    # Overwriting and deleting must not be hidden by the cached listing
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_list.json', 'label_size': '29'})
+    assert resp.status_code == 200
+    files = client.get('/labeldesigner/api/repository/list').get_json()['files']
+    assert [(f['name'], f['label_size']) for f in files] == [('repo_list.json', '29mm endless')]
+
+    resp = client.post('/labeldesigner/api/repository/delete?name=repo_list.json')
+    assert resp.status_code == 200
+    assert client.get('/labeldesigner/api/repository/list').get_json()['files'] == []
+
+
+def test_repository_print_reflects_changes(tmp_path):
+    client = make_client(tmp_path)
+    print_url = '/labeldesigner/api/repository/print?printer=simulation'
+
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_cache.json', 'label_size': '62'})
+    assert resp.status_code == 200
+    resp = client.post(print_url, json={'name': 'repo_cache.json'})
+    assert resp.status_code == 200
+
+    # Overwriting the file must not be hidden by the parsed-file cache
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_cache.json', 'label_size': 'bogus'})
+    assert resp.status_code == 200
+    resp = client.post(print_url, json={'name': 'repo_cache.json'})
+    assert resp.status_code == 400
+    assert 'Unknown label_size' in resp.get_json()['message']
+
+
+def test_repository_load_escapes_non_ascii(tmp_path):
+    client = make_client(tmp_path)
+    text = [{'font': 'DejaVu Sans,Book', 'text': 'Grüße – 東京', 'size': '40', 'align': 'center'}]
+    resp = client.post('/labeldesigner/api/repository/save', json={'name': 'repo_utf8.json', 'label_size': '62', 'text': text})
+    assert resp.status_code == 200
+
+    # JSON responses keep Flask's ASCII-escaped wire format
+    resp = client.get('/labeldesigner/api/repository/load?name=repo_utf8.json')
+    assert resp.status_code == 200
+    assert resp.data.isascii()
+    assert '\\u00fc' in resp.get_data(as_text=True)
+    assert 'Grüße – 東京' in json.dumps(resp.get_json(), ensure_ascii=False)